@@ -6,6 +6,7 @@ from flask import Flask, redirect, url_for
 
 from .config import Config
 from .extensions import init_db
+from .uploads import init_uploads
 
 
 def create_app(config_overrides: dict | None = None) -> Flask:
@@ -25,14 +26,25 @@ def create_app(config_overrides: dict | None = None) -> Flask:
     # Initialize DB and create tables (uses possibly overridden DATABASE_URL)
     init_db(app)
 
+    from .services.job_service import init_jobs
+
+    init_jobs(app)
+    init_uploads(app)
+
+    from .blueprints.caching import FragmentCache
+
+    app.extensions["fragment_cache"] = FragmentCache(app.config["FRAGMENT_CACHE_BYTES"])
+
     # Register blueprints
     from .blueprints.forces import bp as forces_bp
+    from .blueprints.jobs import bp as jobs_bp
     from .blueprints.lance_templates import bp as lance_templates_bp
     from .blueprints.miniatures import bp as miniatures_bp
 
     app.register_blueprint(miniatures_bp)
     app.register_blueprint(forces_bp)
     app.register_blueprint(lance_templates_bp)
+    app.register_blueprint(jobs_bp)
 
     @app.route("/")
     def index():
@@ -0,0 +1,156 @@
+"""Concurrent read/write benchmark for the SQLite connection profile.
+
+Runs the same mixed workload (inventory page reads and miniature updates from several
+threads) against a fresh temporary database twice: once with SQLite's defaults, as
+``init_db`` used to connect, and once with ``Config.SQLITE_PRAGMAS``. Prints throughput,
+latency, busy retries and "database is locked" failures for each run::
+
+    uv run python -m app.bench --threads 8 --seconds 5 --write-ratio 0.2
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from sqlalchemy.exc import OperationalError
+
+from .config import Config
+
+
+class BenchResult(NamedTuple):
+    profile: str
+    reads: int
+    writes: int
+    errors: int
+    retries: int
+    seconds: float
+    p50_ms: float
+    p99_ms: float
+
+    @property
+    def ops_per_second(self) -> float:
+        return (self.reads + self.writes) / self.seconds
+
+
+def _seed(rows: int) -> list[int]:
+    from .services.miniature_service import get_all_miniatures, import_miniatures
+
+    import_miniatures(
+        {
+            "series": "B",
+            "unique_id": n,
+            "prefix": f"M{n % 97}",
+            "chassis": f"Chassis {n % 211}",
+            "type": "Mech",
+            "status": "New",
+        }
+        for n in range(1, rows + 1)
+    )
+    return [m.id for m in get_all_miniatures()]
+
+
+def run_profile(
+    profile: str,
+    pragmas: dict[str, Any],
+    threads: int,
+    seconds: float,
+    write_ratio: float,
+    rows: int,
+) -> BenchResult:
+    """Run the workload against a new database connected with ``pragmas``."""
+    from . import create_app, extensions
+    from .services.miniature_service import get_miniatures_page, update_miniature
+
+    with tempfile.TemporaryDirectory() as tmp:
+        create_app(
+            {
+                "DATABASE_URL": f"sqlite:///{(Path(tmp) / 'bench.db').as_posix()}",
+                "SQLITE_PRAGMAS": pragmas,
+                "JOB_DIR": str(Path(tmp) / "jobs"),
+            }
+        )
+        ids = _seed(rows)
+
+        lock = threading.Lock()
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        latencies: list[float] = []
+        deadline = time.perf_counter() + seconds
+
+        def worker(seed: int) -> None:
+            rng = random.Random(seed)
+            local = {"reads": 0, "writes": 0, "errors": 0}
+            timings = []
+            try:
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        if rng.random() < write_ratio:
+                            update_miniature(rng.choice(ids), {"notes": f"bench {start}"})
+                            local["writes"] += 1
+                        else:
+                            list(get_miniatures_page(page_size=50))
+                            local["reads"] += 1
+                    except OperationalError:
+                        local["errors"] += 1
+                    timings.append(time.perf_counter() - start)
+            finally:
+                extensions.db_session.remove()
+            with lock:
+                for key, value in local.items():
+                    counts[key] += value
+                latencies.extend(timings)
+
+        retries_before = extensions.write_retry_counters()["retries"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(worker, range(threads)))
+        elapsed = time.perf_counter() - started
+        retries = extensions.write_retry_counters()["retries"] - retries_before
+        extensions.engine.dispose()
+
+    latencies.sort()
+    return BenchResult(
+        profile=profile,
+        retries=retries,
+        seconds=elapsed,
+        p50_ms=statistics.median(latencies) * 1000 if latencies else 0.0,
+        p99_ms=latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0,
+        **counts,
+    )
+
+
+def main(argv: list[str] | None = None) -> list[BenchResult]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    results = [
+        run_profile(profile, pragmas, args.threads, args.seconds, args.write_ratio, args.rows)
+        for profile, pragmas in (("defaults", {}), ("tuned", Config.SQLITE_PRAGMAS))
+    ]
+    print(
+        f"{'profile':<10} {'ops/s':>9} {'reads':>7} {'writes':>7} {'locked':>7}"
+        f" {'retries':>7}"
+        f" {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for r in results:
+        print(
+            f"{r.profile:<10} {r.ops_per_second:>9.1f} {r.reads:>7} {r.writes:>7}"
+            f" {r.errors:>7} {r.retries:>7} {r.p50_ms:>8.2f} {r.p99_ms:>8.2f}"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main()
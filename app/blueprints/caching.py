@@ -0,0 +1,141 @@
+"""Conditional GET and rendered-fragment caching for pages derived from versioned data."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import lru_cache, wraps
+from pathlib import Path
+from typing import Any
+
+from flask import current_app, g, make_response, request, session
+
+from ..services.version_service import get_versions
+
+_APP_DIR = Path(__file__).resolve().parent.parent
+
+
+@lru_cache(maxsize=1)
+def _source_fingerprint() -> str:
+    """Hash of the app's code and templates: equal in every worker of one deploy."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(_APP_DIR.rglob("*")):
+        if path.suffix in (".py", ".html") and path.is_file():
+            digest.update(path.relative_to(_APP_DIR).as_posix().encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def etag_salt() -> str:
+    """Deploy-level part of every ETag: ``ETAG_SALT`` if set, else the source fingerprint.
+
+    It must be the same in all worker processes and across restarts of one deploy, so a
+    tag from any worker is honoured by every other, and change when the rendered output
+    may change (new code or templates), so a deploy never serves a stale 304.
+    """
+    return current_app.config.get("ETAG_SALT") or _source_fingerprint()
+
+
+def versioned(*entities: str) -> Callable:
+    """Give a GET view a strong ETag built from its URL and the entities' data versions.
+
+    A matching ``If-None-Match`` is answered with 304 before the view runs. Pages are not
+    tagged while flash messages are pending, since those are rendered once and not cached.
+    """
+
+    def decorate(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            versions = get_versions(*entities)
+            g.data_versions = dict(zip(entities, versions, strict=True))
+            key = f"{etag_salt()}|{request.full_path}|{versions}"
+            etag = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+            if etag in request.if_none_match:
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            # Let browsers keep the copy but always revalidate it
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+def current_versions(*entities: str) -> tuple[int, ...]:
+    """Data versions for this request, reusing the ones read by ``versioned`` if possible."""
+    known = g.get("data_versions", {})
+    if all(entity in known for entity in entities):
+        return tuple(known[entity] for entity in entities)
+    return get_versions(*entities)
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments, bounded by their total size in bytes.
+
+    Keys must capture everything a fragment was rendered from (row values, data versions),
+    so entries never need explicit invalidation; stale ones simply age out.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, size: int | None = None) -> None:
+        """Store ``value``; ``size`` defaults to the UTF-8 length of a string value."""
+        if size is None:
+            size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= evicted
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        fragment = self.get(key)
+        if fragment is None:
+            fragment = render()
+            self.put(key, fragment)
+        return fragment
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def fragment_cache() -> FragmentCache:
+    return current_app.extensions["fragment_cache"]
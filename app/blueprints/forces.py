@@ -2,21 +2,25 @@ from __future__ import annotations
 
 from datetime import datetime
 from io import BytesIO
-from pathlib import Path
 
 from flask import Blueprint, flash, jsonify, redirect, render_template, request, send_file, url_for
 
 from ..services import force_service, lance_template_service
+from .caching import versioned
 
 bp = Blueprint("forces", __name__, url_prefix="/forces")
 
 
 @bp.route("")
+@versioned("forces", "miniatures", "lance_templates")
 def list_forces():
     """List all forces with active indicator."""
     forces = force_service.get_all_forces()
-    active_force = force_service.get_active_force()
-    return render_template("forces/list.html", forces=forces, active_force=active_force)
+    active_force = force_service.get_active_force_snapshot()
+    templates = lance_template_service.get_all_templates()
+    return render_template(
+        "forces/list.html", forces=forces, active_force=active_force, templates=templates
+    )
 
 
 @bp.route("/create", methods=["POST"])
@@ -32,6 +36,44 @@ def create():
     return redirect(url_for("forces.detail", id=force.id))
 
 
+@bp.route("/build", methods=["POST"])
+def build():
+    """Create a force with one lance per template, matching all lances together."""
+    name = request.form.get("name", "").strip()
+    template_ids = [int(t) for t in request.form.getlist("template_ids") if t.isdigit()]
+    if not name:
+        flash("Force name is required", "danger")
+        return redirect(url_for("forces.list_forces"))
+    if not template_ids:
+        flash("At least one template is required", "danger")
+        return redirect(url_for("forces.list_forces"))
+
+    match_result = lance_template_service.match_templates_jointly(template_ids)
+    if match_result["unknown"]:
+        flash("Template not found", "danger")
+        return redirect(url_for("forces.list_forces"))
+
+    # Repeated templates get numbered lance names ("Battle Lance", "Battle Lance 2")
+    seen: dict[str, int] = {}
+    lances = []
+    for lance in match_result["lances"]:
+        template_name = lance["template_name"]
+        seen[template_name] = seen.get(template_name, 0) + 1
+        count = seen[template_name]
+        lance_name = template_name if count == 1 else f"{template_name} {count}"
+        lances.append((lance_name, [mini_id for _, mini_id, _ in lance["matched"]]))
+
+    result = force_service.create_force_with_lances(name, lances)
+    flash(
+        f"Force '{name}' created with {len(lances)} lances and {result['added']} miniatures",
+        "success",
+    )
+    missing = [p for lance in match_result["lances"] for p in lance["missing"]]
+    if missing:
+        flash(f"Missing: {', '.join(missing)}", "warning")
+    return redirect(url_for("forces.detail", id=result["force_id"]))
+
+
 @bp.route("/<int:id>")
 def detail(id: int):  # noqa: A002
     """View force detail with lances."""
@@ -41,8 +83,36 @@ def detail(id: int):  # noqa: A002
         return redirect(url_for("forces.list_forces"))
 
     templates = lance_template_service.get_all_templates()
+    feasibility = lance_template_service.force_template_feasibility(id)
 
-    return render_template("forces/detail.html", force=force, templates=templates)
+    return render_template(
+        "forces/detail.html", force=force, templates=templates, feasibility=feasibility
+    )
+
+
+@bp.route("/<int:id>/feasibility")
+@versioned("miniatures", "forces", "lance_templates")
+def feasibility(id: int):  # noqa: A002
+    """How many slots of each template the inventory outside the force can fill (JSON)."""
+    if not force_service.force_exists(id):
+        return jsonify({"success": False, "error": "Force not found"}), 404
+
+    return jsonify(
+        {
+            "success": True,
+            "templates": [
+                {
+                    "template_id": f.template_id,
+                    "name": f.name,
+                    "slots": f.slots,
+                    "fillable": f.fillable,
+                    "complete": f.complete,
+                    "missing": list(f.missing),
+                }
+                for f in lance_template_service.force_template_feasibility(id)
+            ],
+        }
+    )
 
 
 @bp.route("/<int:id>/activate", methods=["POST"])
@@ -153,21 +223,26 @@ def create_lance_from_template(id: int):  # noqa: A002
 
     # Create lance with matched miniatures
     lance_name = request.form.get("name") or match_result["template_name"]
-    lance = force_service.create_empty_lance(id, lance_name)
-
-    if not lance:
-        return jsonify({"success": False, "error": "Force not found"}), 404
+    result = force_service.create_lance_with_miniatures(
+        id, lance_name, [mini_id for _, mini_id, _ in match_result["matched"]]
+    )
 
-    # Add matched miniatures
-    for idx, (pattern, mini_id, miniature) in enumerate(match_result["matched"]):
-        force_service.add_miniature_to_lance(mini_id, lance.id, position=idx)
+    if not result["success"]:
+        return jsonify(result), 404
 
-    flash(f"Lance '{lance_name}' created with {len(match_result['matched'])} miniatures", "success")
+    flash(f"Lance '{lance_name}' created with {len(result['added'])} miniatures", "success")
 
     if match_result["missing"]:
         flash(f"Missing: {', '.join(match_result['missing'])}", "warning")
+    if result["skipped"]:
+        # Assigned elsewhere in the force, or deleted, between matching and creating the lance
+        flash(
+            f"{len(result['skipped'])} matched miniature(s) were already in the force "
+            "or no longer exist",
+            "warning",
+        )
 
-    return jsonify({"success": True, "lance_id": lance.id}), 200
+    return jsonify({"success": True, "lance_id": result["lance_id"]}), 200
 
 
 @bp.route("/<int:id>/lances/<int:lance_id>/delete", methods=["POST"])
@@ -188,18 +263,11 @@ def rename_lance(id: int, lance_id: int):  # noqa: A002
     data = request.get_json() or request.form
     new_name = data.get("name", "").strip() or None
 
-    from ..extensions import session_scope
-    from ..models.lance import Lance
-
-    with session_scope() as session:
-        lance = session.get(Lance, lance_id)
-        if not lance or lance.force_id != id:
-            return jsonify({"success": False, "error": "Lance not found"}), 404
-
-        lance.name = new_name
-        session.flush()
+    lance = force_service.rename_lance(id, lance_id, new_name)
+    if not lance:
+        return jsonify({"success": False, "error": "Lance not found"}), 404
 
-        return jsonify({"success": True, "name": lance.name}), 200
+    return jsonify({"success": True, "name": lance.name}), 200
 
 
 @bp.route("/<int:id>/move-miniature", methods=["POST"])
@@ -221,6 +289,7 @@ def move_miniature(id: int):  # noqa: A002
 
 
 @bp.route("/<int:id>/export")
+@versioned("forces", "miniatures")
 def export(id: int):  # noqa: A002
     """Export force to JSON file."""
     try:
@@ -256,10 +325,8 @@ def import_route():
             flash("No file selected", "warning")
             return redirect(url_for("forces.import_route"))
 
-        temp_path = Path("_upload_force.json")
-        uploaded.save(temp_path)
         try:
-            result = force_service.import_force_from_json(str(temp_path))
+            result = force_service.import_force_from_stream(uploaded.stream)
 
             flash(
                 f"Imported force '{result['force_name']}' with {result['imported_count']} miniatures",
@@ -272,9 +339,6 @@ def import_route():
             return redirect(url_for("forces.detail", id=result["force_id"]))
         except Exception as exc:  # noqa: BLE001
             flash(f"Import failed: {exc}", "danger")
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
 
         return redirect(url_for("forces.import_route"))
 
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from flask import Blueprint, abort, jsonify, redirect, render_template, request, send_file, url_for
+
+from ..services import job_service
+
+bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+def _wants_json() -> bool:
+    best = request.accept_mimetypes.best_match(["text/html", "application/json"])
+    return best == "application/json"
+
+
+def _job_payload(job) -> dict:
+    payload = job.to_dict()
+    payload["status_url"] = url_for("jobs.status", job_id=job.id)
+    if job.result_path:
+        payload["download_url"] = url_for("jobs.download", job_id=job.id)
+    return payload
+
+
+@bp.route("/<kind>", methods=["POST"])
+def enqueue(kind: str):
+    """Start a background import or export; the form fields become the job's parameters."""
+    if not job_service.has_handler(kind):
+        return jsonify({"success": False, "error": f"Unknown job kind: {kind}"}), 404
+
+    params = request.form.to_dict()
+    uploaded = request.files.get("file")
+    if uploaded and uploaded.filename:
+        params["filename"] = uploaded.filename
+    else:
+        uploaded = None
+
+    try:
+        job = job_service.enqueue(kind, params, upload=uploaded.stream if uploaded else None)
+    except ValueError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+
+    if _wants_json():
+        response = jsonify(_job_payload(job))
+        response.status_code = 202
+        response.headers["Location"] = url_for("jobs.status", job_id=job.id)
+        return response
+    return redirect(url_for("jobs.detail", job_id=job.id))
+
+
+@bp.route("/<job_id>")
+def detail(job_id: str):
+    """Progress page for a job; refreshes itself until the job has finished."""
+    job = job_service.get_job(job_id)
+    if not job:
+        abort(404)
+    return render_template("jobs/detail.html", job=job)
+
+
+@bp.route("/<job_id>/status")
+def status(job_id: str):
+    job = job_service.get_job(job_id)
+    if not job:
+        return jsonify({"success": False, "error": "Job not found"}), 404
+    return jsonify(_job_payload(job))
+
+
+@bp.route("/<job_id>/download")
+def download(job_id: str):
+    job = job_service.get_job(job_id)
+    if not job or job.status != "succeeded" or not job.result_path:
+        abort(404)
+    return send_file(
+        job.result_path,
+        mimetype=job.result_mimetype,
+        as_attachment=True,
+        download_name=job.result_name,
+    )
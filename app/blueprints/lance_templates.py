@@ -1,16 +1,23 @@
 from __future__ import annotations
 
 from io import BytesIO
-from pathlib import Path
 
 from flask import Blueprint, flash, redirect, render_template, request, send_file, url_for
 
 from ..services import lance_template_service
+from ..services.patterns import pattern_error
+from .caching import versioned
 
 bp = Blueprint("lance_templates", __name__, url_prefix="/lance-templates")
 
 
+def _first_pattern_error(patterns: list[str]) -> str | None:
+    """The error for the first malformed chassis pattern, if any."""
+    return next(filter(None, map(pattern_error, patterns)), None)
+
+
 @bp.route("")
+@versioned("lance_templates")
 def list_templates():
     """List all lance templates."""
     templates = lance_template_service.get_all_templates()
@@ -40,6 +47,11 @@ def create():
             flash("At least one chassis pattern is required", "danger")
             return redirect(url_for("lance_templates.create"))
 
+        error = _first_pattern_error(chassis_patterns)
+        if error:
+            flash(f"Invalid chassis pattern: {error}", "danger")
+            return redirect(url_for("lance_templates.create"))
+
         lance_template_service.create_template(name, chassis_patterns, description)
         flash(f"Template '{name}' created successfully", "success")
         return redirect(url_for("lance_templates.list_templates"))
@@ -86,6 +98,11 @@ def edit(id: int):  # noqa: A002
             flash("At least one chassis pattern is required", "danger")
             return redirect(url_for("lance_templates.edit", id=id))
 
+        error = _first_pattern_error(chassis_patterns)
+        if error:
+            flash(f"Invalid chassis pattern: {error}", "danger")
+            return redirect(url_for("lance_templates.edit", id=id))
+
         lance_template_service.update_template(id, name, chassis_patterns, description)
         flash(f"Template '{name}' updated successfully", "success")
         return redirect(url_for("lance_templates.detail", id=id))
@@ -106,6 +123,7 @@ def delete(id: int):  # noqa: A002
 
 
 @bp.route("/export")
+@versioned("lance_templates")
 def export():
     """Export all lance templates to JSON file."""
     try:
@@ -130,10 +148,8 @@ def import_route():
             flash("No file selected", "warning")
             return redirect(url_for("lance_templates.import_route"))
 
-        temp_path = Path("_upload_templates.json")
-        uploaded.save(temp_path)
         try:
-            result = lance_template_service.import_templates_from_json(str(temp_path))
+            result = lance_template_service.import_templates_from_stream(uploaded.stream)
 
             flash(
                 f"Imported {result['imported_count']} template(s). "
@@ -143,9 +159,6 @@ def import_route():
             return redirect(url_for("lance_templates.list_templates"))
         except ValueError as e:
             flash(f"Import failed: {str(e)}", "danger")
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
 
         return redirect(url_for("lance_templates.import_route"))
 
@@ -1,61 +1,142 @@
 from __future__ import annotations
 
-from io import BytesIO
-from pathlib import Path
+from collections.abc import Iterator
 
 from flask import (
     Blueprint,
+    Response,
     flash,
+    get_flashed_messages,
+    get_template_attribute,
     redirect,
     render_template,
     request,
-    send_file,
+    stream_template,
+    stream_with_context,
     url_for,
 )
+from markupsafe import Markup
 
 from ..services import force_service
 from ..services.miniature_service import (
+    DEFAULT_PAGE_SIZE,
+    EXPORT_FORMATS,
+    MiniaturePage,
     add_miniature,
     delete_miniature,
-    export_to_json,
-    get_all_miniatures,
-    import_from_json,
+    get_miniature,
+    get_miniatures_page,
+    import_from_stream,
     update_miniature,
 )
+from ..services.streaming import chunked, gzip_chunks
+from .caching import current_versions, fragment_cache, versioned
 
 bp = Blueprint("miniatures", __name__, url_prefix="/miniatures")
 
 
 @bp.route("")
+@versioned("miniatures", "forces")
 def list_miniatures():
     q = request.args.get("q")
     sort = request.args.get("sort")
     direction = request.args.get("direction")
     series_filter = request.args.get("series", "All")
-    minis = get_all_miniatures(q, sort=sort, direction=direction, series_filter=series_filter)
-
-    # Get active force info for UI
-    active_force = force_service.get_active_force()
-    assigned_miniature_ids = set()
-    lances = []
+    after = request.args.get("after")
+    page_size = request.args.get("page_size", DEFAULT_PAGE_SIZE, type=int)
+    page = get_miniatures_page(
+        q,
+        sort=sort,
+        direction=direction,
+        series_filter=series_filter,
+        after=after,
+        page_size=page_size,
+    )
 
-    if active_force:
-        assigned_miniature_ids = force_service.get_miniatures_in_force(active_force.id)
-        lances = active_force.lances
+    # Active force info for the UI comes from a cached snapshot (no queries when unchanged)
+    active_force = force_service.get_active_force_snapshot()
+    rows = _TableRows(
+        page,
+        page_key=(q, sort, direction, series_filter, after, page.page_size),
+        active_force=active_force,
+    )
 
-    return render_template(
+    # The session is saved before a streamed body renders, so take the flash messages now;
+    # the template's get_flashed_messages() then reads them from the request context
+    get_flashed_messages(with_categories=True)
+    # Stream the page so the first rows reach the browser while later ones are still loading
+    return stream_template(
         "miniatures/list.html",
-        miniatures=minis,
+        rows=rows,
+        # Only carry page_size through links when the user chose a non-default size
+        page_size=page.page_size if page.page_size != DEFAULT_PAGE_SIZE else None,
+        after=after,
         query=q,
         sort=sort,
         direction=direction,
         series_filter=series_filter,
         active_force=active_force,
-        assigned_miniature_ids=assigned_miniature_ids,
-        lances=lances,
+        lances=active_force.lances if active_force else (),
     )
 
 
+class _TableRows:
+    """Rendered rows of one inventory page, served from the fragment cache where possible.
+
+    A whole page is cached under its query and the inventory and force data versions. On a
+    miss each row is looked up by its own values, so only rows whose data changed are
+    rendered again. ``next_cursor`` is set once iteration finishes.
+    """
+
+    def __init__(self, page: MiniaturePage, page_key: tuple, active_force) -> None:
+        self._page = page
+        self._active_force = active_force
+        self._page_key = ("miniatures.page", *page_key, current_versions("miniatures", "forces"))
+        self.next_cursor: str | None = None
+
+    def __iter__(self) -> Iterator[Markup]:
+        cache = fragment_cache()
+        cached = cache.get(self._page_key)
+        if cached is not None:
+            html, self.next_cursor = cached
+            if html:
+                yield Markup(html)
+            return
+
+        render_row = get_template_attribute("miniatures/_row.html", "row")
+        force = self._active_force
+        assigned = force.assigned_miniature_ids if force else frozenset()
+        # The lance picker is rendered once per page; rows only need to know it exists
+        can_assign = bool(force and force.lances)
+
+        fragments = []
+        for m in self._page:
+            is_assigned = m.id in assigned
+            key = (
+                "miniatures.row",
+                m.id,
+                m.series,
+                m.unique_id,
+                m.prefix,
+                m.chassis,
+                m.type,
+                m.status,
+                m.tray_id,
+                m.notes,
+                is_assigned,
+                can_assign,
+            )
+            fragment = cache.get_or_render(
+                key, lambda m=m, is_assigned=is_assigned: render_row(m, is_assigned, can_assign)
+            )
+            fragments.append(fragment)
+            yield Markup(fragment)
+
+        self.next_cursor = self._page.next_cursor
+        html = "".join(fragments)
+        cache.put(self._page_key, (html, self.next_cursor), len(html.encode("utf-8")))
+
+
 @bp.route("/add", methods=["GET", "POST"])
 def add():
     if request.method == "POST":
@@ -115,7 +196,7 @@ def duplicate(id: int):  # noqa: A002
     from ..extensions import session_scope
     from ..models.miniature import Miniature
 
-    with session_scope() as session:
+    with session_scope(read_only=True) as session:
         mini = session.get(Miniature, id)
         if not mini:
             flash("Miniature not found", "danger")
@@ -145,10 +226,7 @@ def duplicate(id: int):  # noqa: A002
 
 @bp.route("/<int:id>/edit", methods=["GET", "POST"])
 def edit(id: int):  # noqa: A002
-    from ..services.miniature_service import get_all_miniatures
-
-    # Simple lookup; could optimize with direct get
-    mini = next((m for m in get_all_miniatures() if m.id == id), None)
+    mini = get_miniature(id)
     if not mini:
         flash("Miniature not found", "danger")
         return redirect(url_for("miniatures.list_miniatures"))
@@ -210,15 +288,35 @@ def delete(id: int):  # noqa: A002
 
 
 @bp.route("/export")
+@versioned("miniatures")
 def export():
-    temp_path = Path("miniatures_export.json")
-    export_to_json(str(temp_path))
-    # Serve as attachment
-    return send_file(
-        BytesIO(temp_path.read_bytes()),
-        mimetype="application/json",
-        as_attachment=True,
-        download_name="miniatures.json",
+    """Stream the inventory as a download.
+
+    ``?format=json|ndjson|csv`` picks the format (JSON by default), ``?compact=1`` drops
+    JSON indentation and ``?gzip=1`` compresses any of them.
+    """
+    fmt = request.args.get("format", "json")
+    if fmt not in EXPORT_FORMATS:
+        flash(f"Unknown export format: {fmt}", "danger")
+        return redirect(url_for("miniatures.import_route"))
+
+    iter_pieces, mimetype, extension = EXPORT_FORMATS[fmt]
+    if fmt == "json":
+        pieces = iter_pieces(compact=request.args.get("compact") == "1")
+    else:
+        pieces = iter_pieces()
+    body = chunked(pieces)
+    download_name = f"miniatures.{extension}"
+
+    if request.args.get("gzip") == "1":
+        body = gzip_chunks(body)
+        download_name += ".gz"
+        mimetype = "application/gzip"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={download_name}"},
     )
 
 
@@ -231,15 +329,17 @@ def import_route():
             flash("No file selected", "warning")
             return redirect(url_for("miniatures.import_route"))
 
-        temp_path = Path("_upload.json")
-        uploaded.save(temp_path)
         try:
-            count = import_from_json(str(temp_path), merge=merge_flag)
-            flash(f"Imported {count} miniatures", "success")
+            report = import_from_stream(
+                uploaded.stream, merge=merge_flag, filename=uploaded.filename
+            )
+            flash(f"Imported {report['imported']} miniatures", "success")
+            if report["error_count"]:
+                details = "; ".join(
+                    f"record {e['record']}: {e['error']}" for e in report["errors"][:10]
+                )
+                flash(f"Skipped {report['error_count']} invalid record(s): {details}", "warning")
         except Exception as exc:  # noqa: BLE001
             flash(f"Import failed: {exc}", "danger")
-        finally:
-            if temp_path.exists():
-                temp_path.unlink()
         return redirect(url_for("miniatures.list_miniatures"))
     return render_template("miniatures/import.html")
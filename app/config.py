@@ -11,6 +11,43 @@ class Config:
     # Database URL, default to sqlite file inside app folder
     DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{(BASE_DIR / 'app.db').as_posix()}")
     JSON_SORT_KEYS = False
+    # SQLite connection profile, applied as PRAGMAs to every new connection (see init_db).
+    # WAL lets readers run alongside a writer; busy_timeout makes a blocked writer wait
+    # instead of failing with "database is locked".
+    SQLITE_PRAGMAS = {
+        "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+        "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "foreign_keys": "ON",
+        # Negative cache_size is in KiB
+        "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", str(-64 * 1024))),
+        "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        "temp_store": "MEMORY",
+    }
+    # Connection pool for file databases: one connection per WSGI worker thread plus headroom
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "8"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    # Writes that still find the database locked after busy_timeout are retried with
+    # jittered exponential backoff (seconds) before giving up
+    WRITE_RETRY_ATTEMPTS = int(os.environ.get("WRITE_RETRY_ATTEMPTS", "5"))
+    WRITE_RETRY_BASE_DELAY = float(os.environ.get("WRITE_RETRY_BASE_DELAY", "0.05"))
+    WRITE_RETRY_MAX_DELAY = float(os.environ.get("WRITE_RETRY_MAX_DELAY", "1.0"))
+    # Largest accepted request body; uploads above the spool threshold go to a temp file
+    MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", str(64 * 1024 * 1024)))
+    UPLOAD_SPOOL_THRESHOLD = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", str(1024 * 1024)))
+    # Deploy-level ETag salt shared by all workers; defaults to a hash of the app source
+    ETAG_SALT = os.environ.get("ETAG_SALT")
+    # Budget for cached rendered HTML (miniatures table rows and pages)
+    FRAGMENT_CACHE_BYTES = int(os.environ.get("FRAGMENT_CACHE_BYTES", str(16 * 1024 * 1024)))
+    # Background jobs (imports/exports): worker threads and where uploads/results are kept
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+    JOB_DIR = os.environ.get("JOB_DIR", str(BASE_DIR / "jobs"))
+    # Seconds between worker heartbeats, and without one before a job counts as orphaned
+    JOB_HEARTBEAT_INTERVAL = float(os.environ.get("JOB_HEARTBEAT_INTERVAL", "15"))
+    JOB_STALE_AFTER = float(os.environ.get("JOB_STALE_AFTER", "120"))
+    # Seconds finished jobs (rows and files) are kept
+    JOB_RETENTION = float(os.environ.get("JOB_RETENTION", str(7 * 24 * 3600)))
 
 
 class TestingConfig(Config):
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
-from collections.abc import Iterator
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
 from contextlib import contextmanager
+from functools import wraps
+from typing import Any, NamedTuple
 
-from flask import Flask
-from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, scoped_session, sessionmaker
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import URL, create_engine, event, make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import DeclarativeBase, Session, scoped_session, sessionmaker
 
 
 class Base(DeclarativeBase):
@@ -16,32 +22,261 @@ engine = None
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False)
 db_session = scoped_session(SessionLocal)
 
+# Requests that only read get one read-only unit of work shared by every service call
+READ_ONLY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class ReadOnlySessionError(RuntimeError):
+    """Raised when ORM changes are flushed through a read-only session."""
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _reject_read_only_flush(session: Session, flush_context, instances) -> None:  # noqa: ARG001
+    if session.info.get("read_only") and (session.new or session.dirty or session.deleted):
+        raise ReadOnlySessionError("Cannot write through a read-only session")
+
+
+def _use_explicit_sqlite_transactions(engine) -> None:
+    """Let SQLAlchemy, not pysqlite, decide when SQLite transactions begin.
+
+    pysqlite only opens a transaction before data changes, so the SELECTs of one unit of
+    work would each see a different database state. With its implicit handling disabled a
+    deferred ``BEGIN`` starts every transaction: reads share one consistent snapshot and
+    take no write lock.
+    """
+
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record) -> None:  # noqa: ARG001
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection) -> None:
+        # In-memory databases share one DBAPI connection per thread, which another
+        # session's transaction may already hold open
+        if not connection.connection.dbapi_connection.in_transaction:
+            mode = connection.get_execution_options().get("sqlite_begin")
+            connection.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+
+def _apply_sqlite_pragmas(engine, pragmas: dict[str, Any]) -> None:
+    """Run ``PRAGMA name = value`` for each entry on every new DBAPI connection."""
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:  # noqa: ARG001
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def _engine_options(app: Flask, url: URL) -> dict[str, Any]:
+    """Pool sizing for file databases; in-memory SQLite keeps its per-thread connection."""
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": app.config.get("DB_POOL_SIZE", 8),
+        "max_overflow": app.config.get("DB_MAX_OVERFLOW", 8),
+        "pool_timeout": app.config.get("DB_POOL_TIMEOUT", 30),
+    }
+
 
 def init_db(app: Flask) -> None:
-    """Initialize SQLAlchemy engine/session and create tables."""
-    global engine
-    engine = create_engine(app.config["DATABASE_URL"], future=True)
+    """Initialize SQLAlchemy engine/session, create tables and apply migrations."""
+    global engine, retry_policy
+    url = make_url(app.config["DATABASE_URL"])
+    engine = create_engine(url, future=True, **_engine_options(app, url))
+    if engine.dialect.name == "sqlite":
+        _apply_sqlite_pragmas(engine, app.config.get("SQLITE_PRAGMAS") or {})
+        _use_explicit_sqlite_transactions(engine)
     SessionLocal.configure(bind=engine)
+    defaults = RetryPolicy()
+    retry_policy = RetryPolicy(
+        attempts=app.config.get("WRITE_RETRY_ATTEMPTS", defaults.attempts),
+        base_delay=app.config.get("WRITE_RETRY_BASE_DELAY", defaults.base_delay),
+        max_delay=app.config.get("WRITE_RETRY_MAX_DELAY", defaults.max_delay),
+    )
+    # Drop any thread-local session still bound to a previous engine
+    db_session.remove()
 
     # Import models to register metadata before create_all
     from .models import miniature  # noqa: F401
 
     Base.metadata.create_all(bind=engine)
 
+    from .migrations import upgrade
+
+    upgrade(engine)
+
+    @app.errorhandler(OperationalError)
+    def database_busy(exc: OperationalError):
+        # Still locked after the retries: ask the client to come back rather than fail
+        if not is_busy_error(exc):
+            raise exc
+        return "The database is busy, please try again.", 503, {"Retry-After": "1"}
+
+    @app.after_request
+    def hand_unit_of_work_to_stream(response: Response) -> Response:
+        # A streamed body renders after the view's context is torn down, and Flask pushes
+        # it again around the stream; keep the unit of work open until the body is sent
+        request_session = g.get("_unit_of_work")
+        if request_session is not None and response.is_streamed:
+            g._unit_of_work_streamed = True
+            response.call_on_close(request_session.close)
+        return response
+
     @app.teardown_appcontext
     def remove_session(exception: Exception | None) -> None:  # noqa: ARG001
+        if not g.get("_unit_of_work_streamed"):
+            request_session = g.pop("_unit_of_work", None)
+            if request_session is not None:
+                # Read-only: closing rolls the transaction back, no COMMIT is ever sent
+                request_session.close()
         db_session.remove()
 
 
+def _request_unit_of_work() -> Session | None:
+    """The read-only session shared by a GET request's service calls, opened on first use."""
+    if not has_request_context() or request.method not in READ_ONLY_METHODS:
+        return None
+    session = g.get("_unit_of_work")
+    if session is None:
+        session = g._unit_of_work = SessionLocal(info={"read_only": True})
+    return session
+
+
+# Execution options for a write scope's connection; other dialects ignore the key
+_WRITE_TRANSACTION_OPTIONS = {"sqlite_begin": "IMMEDIATE"}
+
+
 @contextmanager
-def session_scope() -> Iterator:
-    """Provide a transactional scope around a series of operations."""
+def session_scope(read_only: bool = False) -> Iterator[Session]:
+    """Provide a transactional scope around a series of operations.
+
+    Inside a read-only request, read-only scopes reuse the request's unit of work, so a
+    page costs one connection checkout and one transaction however many services it
+    calls; ORM changes made there raise ``ReadOnlySessionError``, and so does opening a
+    write scope at all. Otherwise the scope has its own session, committed on success
+    unless ``read_only``, in which case it is only ever rolled back.
+
+    A scope opened inside another one on the same thread joins it: the outermost scope
+    alone commits, rolls back and closes the session. A write scope cannot be nested in
+    a read-only one.
+
+    Write scopes on SQLite start with ``BEGIN IMMEDIATE``: the write lock is taken (or
+    waited for, up to ``busy_timeout``) before anything is read, so concurrent writers
+    queue up instead of failing when a deferred reader tries to upgrade its lock.
+    """
+    ambient = _request_unit_of_work()
+    if ambient is not None:
+        if not read_only:
+            raise ReadOnlySessionError(f"Cannot open a write scope in a {request.method} request")
+        yield ambient
+        return
+
     session = db_session()
+    depth = session.info.get("scope_depth", 0)
+    if depth:
+        # Nested: the enclosing scope owns the transaction and the session
+        if not read_only and session.info.get("read_only"):
+            raise ReadOnlySessionError("Cannot open a write scope inside a read-only scope")
+        session.info["scope_depth"] = depth + 1
+        try:
+            yield session
+        finally:
+            session.info["scope_depth"] = depth
+        return
+
+    session.info["scope_depth"] = 1
+    if read_only:
+        session.info["read_only"] = True
     try:
+        if not read_only and not session.in_transaction():
+            session.connection(execution_options=_WRITE_TRANSACTION_OPTIONS)
         yield session
-        session.commit()
+        # A read-only scope is ended by close(), which rolls back without expiring the
+        # objects it loaded
+        if not read_only:
+            session.commit()
     except Exception:  # noqa: BLE001
         session.rollback()
         raise
     finally:
+        session.info.pop("read_only", None)
+        session.info.pop("scope_depth", None)
         session.close()
+
+
+# SQLite primary result codes meaning another connection holds a conflicting lock
+_SQLITE_BUSY_CODES = frozenset({5, 6})  # SQLITE_BUSY, SQLITE_LOCKED
+
+
+def is_busy_error(exc: BaseException) -> bool:
+    """Whether ``exc`` is SQLite reporting "database is locked" (or a locked table)."""
+    if not isinstance(exc, OperationalError):
+        return False
+    code = getattr(exc.orig, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in _SQLITE_BUSY_CODES
+    return "database is locked" in str(exc.orig)
+
+
+class RetryPolicy(NamedTuple):
+    attempts: int = 5
+    base_delay: float = 0.05
+    max_delay: float = 1.0
+
+    def delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number ``attempt`` (from 1)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+# Set from the app config by init_db
+retry_policy = RetryPolicy()
+
+_retry_lock = threading.Lock()
+_retry_counters = {"retries": 0, "give_ups": 0}
+
+
+def write_retry_counters() -> dict[str, int]:
+    """Busy retries and operations that failed after exhausting them, since start-up."""
+    with _retry_lock:
+        return dict(_retry_counters)
+
+
+def _count(counter: str) -> None:
+    with _retry_lock:
+        _retry_counters[counter] += 1
+
+
+def retry_on_busy[F: Callable[..., Any]](func: F) -> F:
+    """Re-run the wrapped write operation when SQLite reports the database is busy.
+
+    Each attempt is a complete transaction that was rolled back, so the operation must be
+    safe to repeat (no side effects outside the database, and no consumed input streams).
+    Calls made inside an already open transaction are not retried here: the outer
+    operation owns the retry.
+    """
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if db_session.registry.has() and db_session().in_transaction():
+            return func(*args, **kwargs)
+
+        policy = retry_policy
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if not is_busy_error(exc):
+                    raise
+                if attempt >= policy.attempts:
+                    _count("give_ups")
+                    raise
+            _count("retries")
+            time.sleep(policy.delay(attempt))
+            attempt += 1
+
+    return wrapper  # type: ignore[return-value]
@@ -1,15 +1,290 @@
-"""Database migrations for MechBay."""
+"""Database migrations for MechBay.
+
+Migrations are ordered, numbered steps recorded in a ``schema_version`` table and applied
+by ``upgrade`` (called from ``init_db`` on every start). ``create_all`` runs first and gives
+fresh databases the current tables and declared indexes, so every step must be idempotent:
+it has to work both on a brand new database and on an older ``app.db``.
+"""
 
 from __future__ import annotations
 
+from collections.abc import Callable
+from datetime import datetime
+from typing import NamedTuple
+
 from flask import Flask
+from sqlalchemy import Connection, Engine, text
 
 from .config import Config
 
+# Rows per transaction for data backfills
+BACKFILL_BATCH_SIZE = 1000
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str) -> Callable:
+    """Register the decorated function as migration step ``version``."""
+
+    def register(func: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+
+    return register
+
+
+def backfill(
+    connection: Connection,
+    table: str,
+    statement: str,
+    key: str = "id",
+    batch_size: int = BACKFILL_BATCH_SIZE,
+) -> int:
+    """Run ``statement`` over ``table`` in windows of ``batch_size`` ``key`` values.
+
+    ``statement`` must restrict itself with ``:lo`` and ``:hi`` (inclusive) bounds on
+    ``key``. Each window is committed separately so large tables never hold the write
+    lock for long; the statement must therefore be safe to re-run after an interruption.
+    Returns the number of rows affected.
+    """
+    low, high = connection.execute(text(f"SELECT MIN({key}), MAX({key}) FROM {table}")).one()
+    connection.commit()
+    if low is None:
+        return 0
+
+    affected = 0
+    for lo in range(low, high + 1, batch_size):
+        result = connection.execute(text(statement), {"lo": lo, "hi": lo + batch_size - 1})
+        affected += max(result.rowcount, 0)
+        connection.commit()
+    return affected
+
+
+def current_version(connection: Connection) -> int:
+    """Return the highest applied migration version (0 for an unversioned database)."""
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        " version INTEGER PRIMARY KEY,"
+        " description VARCHAR(255) NOT NULL,"
+        " applied_at DATETIME NOT NULL)"
+    )
+    return connection.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def upgrade(engine: Engine) -> list[int]:
+    """Apply all pending migrations in order, returning the versions applied.
+
+    Every transaction starts with ``BEGIN IMMEDIATE`` on SQLite, so workers starting
+    together take turns: each step re-reads the version under the write lock, and the
+    step and its ``schema_version`` row commit together. A step that commits part-way
+    (``backfill``) lets another worker in between its windows; such steps are re-run
+    safely because steps are idempotent, and only one version row is ever recorded.
+    """
+    applied = []
+    with engine.connect() as connection:
+        connection.execution_options(sqlite_begin="IMMEDIATE")
+        for step in sorted(MIGRATIONS, key=lambda m: m.version):
+            if current_version(connection) >= step.version:
+                connection.commit()
+                continue
+            step.apply(connection)
+            recorded = connection.execute(
+                text(
+                    "INSERT OR IGNORE INTO schema_version (version, description, applied_at)"
+                    " VALUES (:version, :description, :applied_at)"
+                ),
+                {
+                    "version": step.version,
+                    "description": step.description,
+                    "applied_at": datetime.utcnow(),
+                },
+            )
+            connection.commit()
+            if recorded.rowcount:
+                applied.append(step.version)
+    return applied
+
+
+# --- Migration steps -------------------------------------------------------------------
+
+# External-content FTS5 index over the searchable miniature columns. The trigram
+# tokenizer keeps substring matching (like the old LIKE '%q%' search) but answers it
+# from the index, case-insensitively.
+_SEARCH_INDEX_DDL = (
+    "DROP TABLE IF EXISTS miniatures_fts",
+    """
+    CREATE VIRTUAL TABLE miniatures_fts USING fts5(
+        prefix, chassis, type, series,
+        content='miniatures', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS miniatures_fts_ai AFTER INSERT ON miniatures BEGIN
+        INSERT INTO miniatures_fts(rowid, prefix, chassis, type, series)
+        VALUES (new.id, new.prefix, new.chassis, new.type, new.series);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS miniatures_fts_ad AFTER DELETE ON miniatures BEGIN
+        INSERT INTO miniatures_fts(miniatures_fts, rowid, prefix, chassis, type, series)
+        VALUES ('delete', old.id, old.prefix, old.chassis, old.type, old.series);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS miniatures_fts_au
+    AFTER UPDATE OF prefix, chassis, type, series ON miniatures BEGIN
+        INSERT INTO miniatures_fts(miniatures_fts, rowid, prefix, chassis, type, series)
+        VALUES ('delete', old.id, old.prefix, old.chassis, old.type, old.series);
+        INSERT INTO miniatures_fts(rowid, prefix, chassis, type, series)
+        VALUES (new.id, new.prefix, new.chassis, new.type, new.series);
+    END
+    """,
+)
+
+
+@migration(1, "Full-text search index for miniatures")
+def _create_search_index(connection: Connection) -> None:
+    if connection.dialect.name != "sqlite":
+        return
+    # The index is derived data, so it is simply rebuilt if a previous run was interrupted
+    for ddl in _SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(ddl)
+    backfill(
+        connection,
+        "miniatures",
+        "INSERT INTO miniatures_fts(rowid, prefix, chassis, type, series)"
+        " SELECT id, prefix, chassis, type, series FROM miniatures"
+        " WHERE id BETWEEN :lo AND :hi",
+    )
+
+
+# Hot-path indexes for joins and filters in force_service and miniature_service. Names
+# match the models' index=True columns, so on fresh databases this step is a no-op.
+_JOIN_INDEXES = (
+    ("ix_miniatures_chassis", "miniatures", "chassis"),
+    ("ix_lances_force_id", "lances", "force_id"),
+    ("ix_force_miniatures_miniature_id", "force_miniatures", "miniature_id"),
+    ("ix_lance_template_miniatures_template_id", "lance_template_miniatures", "template_id"),
+)
+
+
+@migration(2, "Indexes for force, lance and template joins")
+def _create_join_indexes(connection: Connection) -> None:
+    for name, table, columns in _JOIN_INDEXES:
+        connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+# Tables whose changes bump each entity's data version (see version_service)
+DATA_VERSION_TABLES = {
+    "miniatures": ("miniatures",),
+    "forces": ("forces", "lances", "force_miniatures"),
+    "lance_templates": ("lance_templates", "lance_template_miniatures"),
+}
+
+
+@migration(3, "Data version counters maintained by triggers")
+def _create_data_versions(connection: Connection) -> None:
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS data_versions ("
+        " entity VARCHAR(32) PRIMARY KEY,"
+        " version INTEGER NOT NULL DEFAULT 0)"
+    )
+    for entity, tables in DATA_VERSION_TABLES.items():
+        connection.execute(
+            text("INSERT OR IGNORE INTO data_versions (entity, version) VALUES (:entity, 0)"),
+            {"entity": entity},
+        )
+        for table in tables:
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                connection.exec_driver_sql(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}"
+                    f" AFTER {event} ON {table} BEGIN"
+                    f" UPDATE data_versions SET version = version + 1 WHERE entity = '{entity}';"
+                    " END"
+                )
+
+
+@migration(4, "Single active force enforced by a partial unique index")
+def _enforce_single_active_force(connection: Connection) -> None:
+    # Older databases may have several active forces; keep the most recently touched one
+    connection.exec_driver_sql(
+        "UPDATE forces SET is_active = 0 WHERE is_active = 1 AND id != ("
+        " SELECT id FROM forces WHERE is_active = 1"
+        " ORDER BY updated_at DESC, id DESC LIMIT 1)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_forces_single_active"
+        " ON forces (is_active) WHERE is_active = 1"
+    )
+
+
+@migration(5, "Force id on force_miniatures, unique per force")
+def _add_force_miniature_force_id(connection: Connection) -> None:
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(force_miniatures)")}
+    if "force_id" not in columns:
+        # SQLite cannot add a NOT NULL column without a default; the model declares it
+        connection.exec_driver_sql(
+            "ALTER TABLE force_miniatures ADD COLUMN force_id INTEGER REFERENCES forces (id)"
+        )
+        connection.commit()
+    backfill(
+        connection,
+        "force_miniatures",
+        "UPDATE force_miniatures SET force_id ="
+        " (SELECT lances.force_id FROM lances WHERE lances.id = force_miniatures.lance_id)"
+        " WHERE id BETWEEN :lo AND :hi AND force_id IS NULL",
+    )
+    # Assignments whose lance no longer exists have no force to belong to
+    connection.exec_driver_sql("DELETE FROM force_miniatures WHERE force_id IS NULL")
+    # Older databases could hold a miniature in two lances of one force; keep the first
+    connection.exec_driver_sql(
+        "DELETE FROM force_miniatures WHERE id NOT IN ("
+        " SELECT MIN(id) FROM force_miniatures GROUP BY force_id, miniature_id)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uix_force_miniature"
+        " ON force_miniatures (force_id, miniature_id)"
+    )
+
+
+@migration(6, "Worker id and heartbeat on jobs")
+def _add_job_heartbeat(connection: Connection) -> None:
+    columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(jobs)")}
+    if "worker_id" not in columns:
+        connection.exec_driver_sql("ALTER TABLE jobs ADD COLUMN worker_id VARCHAR(64)")
+    if "heartbeat_at" not in columns:
+        connection.exec_driver_sql("ALTER TABLE jobs ADD COLUMN heartbeat_at DATETIME")
+
+
+@migration(7, "Drop assignments whose force, lance, miniature or template is gone")
+def _delete_dangling_rows(connection: Connection) -> None:
+    # Connections enforce foreign keys, which older databases never did; rows pointing at
+    # deleted parents would make unrelated writes to these tables fail
+    connection.exec_driver_sql("DELETE FROM lances WHERE force_id NOT IN (SELECT id FROM forces)")
+    connection.exec_driver_sql(
+        "DELETE FROM force_miniatures"
+        " WHERE force_id NOT IN (SELECT id FROM forces)"
+        " OR lance_id NOT IN (SELECT id FROM lances)"
+        " OR miniature_id NOT IN (SELECT id FROM miniatures)"
+    )
+    connection.exec_driver_sql(
+        "DELETE FROM lance_template_miniatures"
+        " WHERE template_id NOT IN (SELECT id FROM lance_templates)"
+    )
+
 
 def run_migrations():
-    """Create all tables defined in models."""
-    # Create minimal Flask app to initialize DB
+    """Create all tables defined in models and apply pending migrations."""
+    # Create minimal Flask app to initialize DB (init_db runs create_all and upgrade)
     app = Flask(__name__)
     app.config.from_object(Config())
 
@@ -17,19 +292,12 @@ def run_migrations():
 
     init_db(app)
 
-    # Import models to ensure they're registered
-    from .extensions import Base, engine
-    from .models import (  # noqa: F401
-        Force,
-        ForceMiniature,
-        Lance,
-        LanceTemplate,
-        LanceTemplateMiniature,
-        Miniature,
-    )
+    from .extensions import engine
 
-    Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully")
+    with engine.connect() as connection:
+        version = current_version(connection)
+        connection.commit()
+    print(f"Database schema is at version {version}")
 
 
 if __name__ == "__main__":
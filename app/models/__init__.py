@@ -1,5 +1,6 @@
 from .force import Force  # noqa: F401
 from .force_miniature import ForceMiniature  # noqa: F401
+from .job import Job  # noqa: F401
 from .lance import Lance  # noqa: F401
 from .lance_template import LanceTemplate  # noqa: F401
 from .lance_template_miniature import LanceTemplateMiniature  # noqa: F401
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey, Integer, UniqueConstraint
+from sqlalchemy import ForeignKey, Index, Integer, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..extensions import Base
@@ -14,11 +14,19 @@ if TYPE_CHECKING:
 
 class ForceMiniature(Base):
     __tablename__ = "force_miniatures"
-    __table_args__ = (UniqueConstraint("lance_id", "miniature_id", name="uix_lance_miniature"),)
+    __table_args__ = (
+        UniqueConstraint("lance_id", "miniature_id", name="uix_lance_miniature"),
+        # A miniature can only be in one lance of a force; also the index for force lookups
+        Index("uix_force_miniature", "force_id", "miniature_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Denormalized from the lance (lances never change force)
+    force_id: Mapped[int] = mapped_column(Integer, ForeignKey("forces.id"), nullable=False)
     lance_id: Mapped[int] = mapped_column(Integer, ForeignKey("lances.id"), nullable=False)
-    miniature_id: Mapped[int] = mapped_column(Integer, ForeignKey("miniatures.id"), nullable=False)
+    miniature_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("miniatures.id"), nullable=False, index=True
+    )
     order: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
     # Relationships
@@ -28,6 +36,7 @@ class ForceMiniature(Base):
     def to_dict(self) -> dict:
         return {
             "id": self.id,
+            "force_id": self.force_id,
             "lance_id": self.lance_id,
             "miniature_id": self.miniature_id,
             "order": self.order,
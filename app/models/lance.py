@@ -16,7 +16,9 @@ class Lance(Base):
     __tablename__ = "lances"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    force_id: Mapped[int] = mapped_column(Integer, ForeignKey("forces.id"), nullable=False)
+    force_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("forces.id"), nullable=False, index=True
+    )
     name: Mapped[str | None] = mapped_column(String(128), nullable=True)
     order: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
@@ -16,7 +16,7 @@ class LanceTemplateMiniature(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     template_id: Mapped[int] = mapped_column(
-        Integer, ForeignKey("lance_templates.id"), nullable=False
+        Integer, ForeignKey("lance_templates.id"), nullable=False, index=True
     )
     chassis_pattern: Mapped[str] = mapped_column(String(128), nullable=False)
     order: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
@@ -18,7 +18,7 @@ class Miniature(Base):
     # Changed to Integer per new requirement
     unique_id: Mapped[int] = mapped_column(Integer, nullable=False)
     prefix: Mapped[str] = mapped_column(String(16), nullable=False)
-    chassis: Mapped[str] = mapped_column(String(128), nullable=False)
+    chassis: Mapped[str] = mapped_column(String(128), nullable=False, index=True)
     type: Mapped[str] = mapped_column(String(32), nullable=False)
     status: Mapped[str] = mapped_column(String(32), nullable=True)
     tray_id: Mapped[str] = mapped_column(String(64), nullable=True)
@@ -0,0 +1,233 @@
+"""In-memory chassis index for template matching.
+
+Maps each distinct (chassis, prefix) variant to the sorted ids of the miniatures carrying
+it, with a trigram inverted index over the chassis names so a substring pattern only
+checks names sharing all of its trigrams. Chassis patterns (``patterns``) are evaluated
+here, so matching a template (or every template) needs no SQL per pattern, only the one
+version check made by ``get_chassis_index``.
+
+The index is tagged with the ``miniatures`` data version it reflects. Single-miniature
+writes apply their change in place when the index was current just before them; any
+other change (imports, another process) is noticed through the version and answered by
+a full rebuild on next use.
+"""
+
+from __future__ import annotations
+
+import bisect
+import heapq
+import threading
+from collections.abc import Iterable
+from typing import Any, NamedTuple
+
+from sqlalchemy import Engine, select
+
+from .. import extensions
+from ..extensions import session_scope
+from ..models.miniature import Miniature
+from .patterns import matcher_for, normalize
+from .read_models import columns
+from .version_service import get_versions, read_versions
+
+GRAM_SIZE = 3
+
+# (normalized chassis, normalized prefix)
+Variant = tuple[str, str]
+
+
+class IndexedMiniature(NamedTuple):
+    """What matching needs to know about a miniature besides its chassis."""
+
+    id: int
+    series: str
+    unique_id: int
+    prefix: str
+    chassis: str
+    tray_id: str | None
+
+
+_INDEXED_COLUMNS = columns(IndexedMiniature, Miniature)
+
+
+def entry(miniature: Any) -> IndexedMiniature:
+    """The index entry for a ``Miniature`` (or anything with the same attributes)."""
+    return IndexedMiniature._make(getattr(miniature, f) for f in IndexedMiniature._fields)
+
+
+def _grams(text: str) -> set[str]:
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+class ChassisIndex:
+    """Index variants -> sorted miniature ids, reachable by chassis name, prefix or trigram.
+
+    A variant is a distinct (normalized chassis, normalized prefix) pair; patterns select
+    variants (see ``patterns``), so their cost follows the number of distinct chassis
+    rather than miniatures. The indexed miniatures themselves are kept by id (``get``)
+    for tie-breaking.
+    """
+
+    def __init__(self, engine: Engine | None, version: int) -> None:
+        self.engine = engine
+        self.version = version
+        self._lock = threading.RLock()
+        self._ids_by_variant: dict[Variant, list[int]] = {}
+        self._variant_by_id: dict[int, Variant] = {}
+        self._entries: dict[int, IndexedMiniature] = {}
+        self._variants_by_name: dict[str, set[Variant]] = {}
+        self._variants_by_prefix: dict[str, set[Variant]] = {}
+        self._names_by_gram: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._variant_by_id)
+
+    def get(self, miniature_id: int) -> IndexedMiniature | None:
+        return self._entries.get(miniature_id)
+
+    def add(self, miniature: IndexedMiniature) -> None:
+        with self._lock:
+            miniature_id = miniature.id
+            self.remove(miniature_id)
+            variant = (normalize(miniature.chassis), normalize(miniature.prefix or ""))
+            self._variant_by_id[miniature_id] = variant
+            self._entries[miniature_id] = miniature
+            ids = self._ids_by_variant.get(variant)
+            if ids is None:
+                ids = self._ids_by_variant[variant] = []
+                name, prefix = variant
+                if name not in self._variants_by_name:
+                    for gram in _grams(name):
+                        self._names_by_gram.setdefault(gram, set()).add(name)
+                self._variants_by_name.setdefault(name, set()).add(variant)
+                self._variants_by_prefix.setdefault(prefix, set()).add(variant)
+            bisect.insort(ids, miniature_id)
+
+    def remove(self, miniature_id: int) -> None:
+        with self._lock:
+            variant = self._variant_by_id.pop(miniature_id, None)
+            if variant is None:
+                return
+            del self._entries[miniature_id]
+            ids = self._ids_by_variant[variant]
+            del ids[bisect.bisect_left(ids, miniature_id)]
+            if ids:
+                return
+            del self._ids_by_variant[variant]
+            name, prefix = variant
+            _discard(self._variants_by_prefix, prefix, variant)
+            if _discard(self._variants_by_name, name, variant):
+                for gram in _grams(name):
+                    _discard(self._names_by_gram, gram, name)
+
+    def names(self) -> list[str]:
+        """Every normalized chassis name in the index."""
+        with self._lock:
+            return list(self._variants_by_name)
+
+    def names_containing(self, text: str) -> list[str]:
+        """Normalized chassis names containing the normalized ``text``."""
+        with self._lock:
+            grams = _grams(text)
+            if not grams:
+                # Too short for a trigram: check every distinct name
+                return [name for name in self._variants_by_name if text in name]
+            postings = sorted((self._names_by_gram.get(g, set()) for g in grams), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            return [name for name in candidates if text in name]
+
+    def variants_for_names(self, names: Iterable[str]) -> set[Variant]:
+        with self._lock:
+            return set().union(*(self._variants_by_name.get(name, ()) for name in names))
+
+    def variants_with_prefix(self, prefix: str) -> set[Variant]:
+        with self._lock:
+            return set(self._variants_by_prefix.get(prefix, ()))
+
+    def variants_matching(self, pattern: str) -> set[Variant]:
+        """The variants the chassis pattern ``pattern`` accepts."""
+        with self._lock:
+            return matcher_for(pattern).variants(self)
+
+    def count_table(self, exclude_ids: Iterable[int] = ()) -> dict[Variant, int]:
+        """Miniatures per variant, not counting ``exclude_ids``."""
+        with self._lock:
+            counts = {variant: len(ids) for variant, ids in self._ids_by_variant.items()}
+            for miniature_id in exclude_ids:
+                variant = self._variant_by_id.get(miniature_id)
+                if variant is not None:
+                    counts[variant] -= 1
+            return counts
+
+    def match(self, pattern: str) -> list[int]:
+        """Ids of miniatures matching the chassis pattern ``pattern``, in ascending order."""
+        with self._lock:
+            variants = self.variants_matching(pattern)
+            return list(heapq.merge(*(self._ids_by_variant[v] for v in variants)))
+
+    def match_entries(self, pattern: str) -> list[IndexedMiniature]:
+        """The miniatures ``match`` would return, in the same order."""
+        with self._lock:
+            return [self._entries[mid] for mid in self.match(pattern)]
+
+    def first_match(self, pattern: str, exclude_ids: Iterable[int] = ()) -> int | None:
+        """The lowest id matching ``pattern`` that is not in ``exclude_ids``, or None."""
+        excluded = exclude_ids if isinstance(exclude_ids, set | frozenset) else set(exclude_ids)
+        return next((mid for mid in self.match(pattern) if mid not in excluded), None)
+
+
+def _discard[K, V](mapping: dict[K, set[V]], key: K, value: V) -> bool:
+    """Remove ``value`` from the set at ``key``, dropping the key once empty (True)."""
+    values = mapping[key]
+    values.discard(value)
+    if values:
+        return False
+    del mapping[key]
+    return True
+
+
+_index_lock = threading.Lock()
+_index: ChassisIndex | None = None
+
+
+def _build() -> ChassisIndex:
+    with session_scope(read_only=True) as session:
+        # Version and rows come from the same snapshot
+        (version,) = read_versions(session, "miniatures")
+        index = ChassisIndex(extensions.engine, version)
+        for row in session.execute(select(*_INDEXED_COLUMNS)):
+            index.add(IndexedMiniature._make(row))
+    return index
+
+
+def get_chassis_index() -> ChassisIndex:
+    """Return an index matching the current miniatures, rebuilding it only if stale."""
+    global _index
+    (version,) = get_versions("miniatures")
+    index = _index
+    if index is not None and index.engine is extensions.engine and index.version == version:
+        return index
+
+    index = _build()
+    with _index_lock:
+        if _index is None or _index.engine is not index.engine or _index.version < index.version:
+            _index = index
+    return index
+
+
+def apply_change(
+    before: int, after: int, miniature_id: int, miniature: IndexedMiniature | None
+) -> None:
+    """Record a committed single-miniature write that moved the version ``before`` -> ``after``.
+
+    ``miniature`` is the miniature's new entry, or None if it was deleted. If the index
+    did not reflect ``before`` it is left alone and rebuilt when next used.
+    """
+    with _index_lock:
+        index = _index
+        if index is None or index.engine is not extensions.engine or index.version != before:
+            return
+        if miniature is None:
+            index.remove(miniature_id)
+        else:
+            index.add(miniature)
+        index.version = after
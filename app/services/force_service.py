@@ -1,66 +1,199 @@
 from __future__ import annotations
 
 import json
+import threading
+from collections.abc import Callable
 from datetime import datetime
+from functools import wraps
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, NamedTuple
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import ColumnElement, Engine, and_, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
 
-from ..extensions import session_scope
+from .. import extensions
+from ..extensions import retry_on_busy, session_scope
 from ..models.force import Force
 from ..models.force_miniature import ForceMiniature
 from ..models.lance import Lance
 from ..models.miniature import Miniature
+from .read_models import (
+    ASSIGNMENT_COLUMNS,
+    FORCE_SUMMARY_COLUMNS,
+    LANCE_COLUMNS,
+    AssignmentView,
+    ForceSummary,
+    ForceView,
+    LanceView,
+    MiniatureView,
+)
+from .version_service import read_versions
+
+
+class LanceRef(NamedTuple):
+    id: int
+    name: str | None
+
+
+class ActiveForceSnapshot(NamedTuple):
+    """What list pages need to know about the active force, without its miniature tree."""
+
+    id: int
+    name: str
+    lances: tuple[LanceRef, ...]
+    assigned_miniature_ids: frozenset[int]
+
+
+# Process-level cache of the active force, tagged with the engine it was read from (so a
+# re-initialised database, e.g. a new app in tests, never sees another database's
+# snapshot) and the ``forces`` data version it reflects.
+_snapshot_lock = threading.Lock()
+_snapshot: tuple[Engine, int, ActiveForceSnapshot | None] | None = None
+
+
+def invalidate_active_force() -> None:
+    """Drop the cached active-force snapshot; the next read rebuilds it."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def _invalidates_active_force[F: Callable[..., Any]](func: F) -> F:
+    """Drop the snapshot once the wrapped mutation has committed (or failed).
+
+    Not needed for correctness (the ``forces`` version check catches every change) but
+    frees the stale snapshot at once.
+    """
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            invalidate_active_force()
+
+    return wrapper  # type: ignore[return-value]
+
+
+def _load_active_force_snapshot(session: Session) -> ActiveForceSnapshot | None:
+    row = session.execute(
+        select(Force.id, Force.name).where(Force.is_active == True)  # noqa: E712
+    ).first()
+    if not row:
+        return None
+    lances = session.execute(
+        select(Lance.id, Lance.name).where(Lance.force_id == row.id).order_by(Lance.order)
+    ).all()
+    assigned = session.execute(
+        select(ForceMiniature.miniature_id).where(ForceMiniature.force_id == row.id)
+    ).scalars()
+    return ActiveForceSnapshot(
+        id=row.id,
+        name=row.name,
+        lances=tuple(LanceRef(lance.id, lance.name) for lance in lances),
+        assigned_miniature_ids=frozenset(assigned),
+    )
+
+
+def get_active_force_snapshot() -> ActiveForceSnapshot | None:
+    """Return the cached active-force snapshot, loading it only after forces changed.
+
+    The cache is checked against the ``forces`` data version read in the same
+    transaction as any rebuild. A request's read-only unit of work may be older than a
+    concurrent commit; what it builds is then tagged with the older version, so it is
+    never taken for current and is replaced on the next read, by any process.
+    """
+    global _snapshot
+    with session_scope(read_only=True) as session:
+        (version,) = read_versions(session, "forces")
+        cached = _snapshot
+        if cached is not None and cached[0] is extensions.engine and cached[1] == version:
+            return cached[2]
+        snapshot = _load_active_force_snapshot(session)
+
+    with _snapshot_lock:
+        current = _snapshot
+        if current is None or current[0] is not extensions.engine or current[1] < version:
+            _snapshot = (extensions.engine, version, snapshot)
+    return snapshot
+
+
+def _load_force_view(session: Session, criterion: ColumnElement[bool]) -> ForceView | None:
+    """Build a force tree in three column-only queries (force, lances, assignments)."""
+    force = session.execute(select(*FORCE_SUMMARY_COLUMNS).where(criterion)).first()
+    if not force:
+        return None
+    force_id = force.id
+
+    assignments: dict[int, list[AssignmentView]] = {}
+    rows = session.execute(
+        select(*ASSIGNMENT_COLUMNS)
+        .join(Miniature, ForceMiniature.miniature_id == Miniature.id)
+        .where(ForceMiniature.force_id == force_id)
+        .order_by(ForceMiniature.lance_id, ForceMiniature.order)
+    )
+    for lance_id, order, *miniature in rows:
+        assignments.setdefault(lance_id, []).append(
+            AssignmentView(order, MiniatureView._make(miniature))
+        )
+
+    lances = session.execute(
+        select(*LANCE_COLUMNS).where(Lance.force_id == force_id).order_by(Lance.order)
+    )
+    return ForceView(
+        *force,
+        lances=tuple(
+            LanceView(lance.id, lance.name, lance.order, tuple(assignments.get(lance.id, ())))
+            for lance in lances
+        ),
+    )
 
 
-def get_active_force() -> Force | None:
+def get_active_force() -> ForceView | None:
     """Get the currently active force with all lances and miniatures loaded."""
-    with session_scope() as session:
-        stmt = select(Force).where(Force.is_active == True)  # noqa: E712
-        force = session.execute(stmt).scalar_one_or_none()
-        if force:
-            # Eager load relationships
-            for lance in force.lances:
-                _ = lance.miniatures
-                for fm in lance.miniatures:
-                    _ = fm.miniature
-            # Expunge to make accessible outside session
-            session.expunge(force)
-        return force
+    with session_scope(read_only=True) as session:
+        return _load_force_view(session, Force.is_active == True)  # noqa: E712
 
 
-def get_all_forces() -> list[Force]:
+def get_all_forces() -> list[ForceSummary]:
     """Get all forces with summary info."""
-    with session_scope() as session:
-        stmt = select(Force).order_by(Force.is_active.desc(), Force.created_at.desc())
-        forces = list(session.execute(stmt).scalars().all())
-        # Make all objects accessible outside session
-        for force in forces:
-            session.expunge(force)
-        return forces
+    with session_scope(read_only=True) as session:
+        stmt = select(*FORCE_SUMMARY_COLUMNS).order_by(
+            Force.is_active.desc(), Force.created_at.desc()
+        )
+        return [ForceSummary._make(row) for row in session.execute(stmt)]
 
 
-def get_force_by_id(force_id: int) -> Force | None:
-    """Get a specific force by ID with all relationships loaded."""
-    with session_scope() as session:
-        force = session.get(Force, force_id)
-        if force:
-            # Eager load relationships
-            for lance in force.lances:
-                _ = lance.miniatures
-                for fm in lance.miniatures:
-                    _ = fm.miniature
-            # Expunge to make accessible outside session
-            session.expunge(force)
-        return force
+def force_exists(force_id: int) -> bool:
+    with session_scope(read_only=True) as session:
+        return session.execute(select(Force.id).where(Force.id == force_id)).first() is not None
+
 
+def get_force_by_id(force_id: int) -> ForceView | None:
+    """Get a specific force by ID with its lances and miniatures."""
+    with session_scope(read_only=True) as session:
+        return _load_force_view(session, Force.id == force_id)
 
+
+def _deactivate_current_force(session: Session, keep_id: int | None = None) -> None:
+    """Clear the active flag on the (at most one) active force other than ``keep_id``.
+
+    The partial unique index ``ux_forces_single_active`` guarantees a single active row, so
+    this touches one row found through that index however many forces exist.
+    """
+    stmt = update(Force).where(Force.is_active == True)  # noqa: E712
+    if keep_id is not None:
+        stmt = stmt.where(Force.id != keep_id)
+    session.execute(stmt.values(is_active=False, updated_at=datetime.utcnow()))
+
+
+@_invalidates_active_force
+@retry_on_busy
 def create_force(name: str) -> Force:
-    """Create a new force and set it as active, deactivating others."""
+    """Create a new force and set it as active, deactivating the previous one."""
     with session_scope() as session:
-        # Deactivate all existing forces
-        session.query(Force).update({"is_active": False})
+        _deactivate_current_force(session)
 
         # Create new force as active
         force = Force(name=name, is_active=True)
@@ -69,15 +202,16 @@ def create_force(name: str) -> Force:
         return force
 
 
+@_invalidates_active_force
+@retry_on_busy
 def switch_force(force_id: int) -> Force | None:
-    """Activate a specific force and deactivate all others."""
+    """Activate a specific force and deactivate the previously active one."""
     with session_scope() as session:
         force = session.get(Force, force_id)
         if not force:
             return None
 
-        # Deactivate all forces
-        session.query(Force).update({"is_active": False})
+        _deactivate_current_force(session, keep_id=force.id)
 
         # Activate selected force
         force.is_active = True
@@ -86,6 +220,8 @@ def switch_force(force_id: int) -> Force | None:
         return force
 
 
+@_invalidates_active_force
+@retry_on_busy
 def rename_force(force_id: int, new_name: str) -> Force | None:
     """Rename a force."""
     with session_scope() as session:
@@ -99,6 +235,8 @@ def rename_force(force_id: int, new_name: str) -> Force | None:
         return force
 
 
+@_invalidates_active_force
+@retry_on_busy
 def delete_force(force_id: int) -> bool:
     """Delete a force and all its lances/assignments."""
     with session_scope() as session:
@@ -109,10 +247,16 @@ def delete_force(force_id: int) -> bool:
         return True
 
 
+@_invalidates_active_force
+@retry_on_busy
 def add_miniature_to_lance(
     miniature_id: int, lance_id: int, position: int | None = None
 ) -> dict[str, Any]:
-    """Add a miniature to a lance, validating uniqueness within the force."""
+    """Add a miniature to a lance; a miniature can be in only one lance per force.
+
+    Uniqueness is enforced by the ``uix_force_miniature`` index: the insert does nothing
+    if the miniature is already in the force, so concurrent adds cannot both succeed.
+    """
     with session_scope() as session:
         lance = session.get(Lance, lance_id)
         if not lance:
@@ -122,22 +266,6 @@ def add_miniature_to_lance(
         if not miniature:
             return {"success": False, "error": "Miniature not found"}
 
-        # Check if miniature already in this force
-        existing = (
-            session.query(ForceMiniature)
-            .join(Lance)
-            .filter(
-                and_(Lance.force_id == lance.force_id, ForceMiniature.miniature_id == miniature_id)
-            )
-            .first()
-        )
-
-        if existing:
-            return {
-                "success": False,
-                "error": f"Miniature already in force (Lance: {existing.lance.name or 'Unnamed'})",
-            }
-
         # Determine position
         if position is None:
             max_order = (
@@ -147,26 +275,50 @@ def add_miniature_to_lance(
             ) or 0
             position = max_order + 1
 
-        # Add miniature
-        fm = ForceMiniature(lance_id=lance_id, miniature_id=miniature_id, order=position)
-        session.add(fm)
-        session.flush()
+        fm_id = session.execute(
+            sqlite_insert(ForceMiniature)
+            .values(
+                force_id=lance.force_id,
+                lance_id=lance_id,
+                miniature_id=miniature_id,
+                order=position,
+            )
+            .on_conflict_do_nothing(index_elements=["force_id", "miniature_id"])
+            .returning(ForceMiniature.id)
+        ).scalar()
+
+        if fm_id is None:
+            lance_name = session.execute(
+                select(Lance.name)
+                .join(ForceMiniature, ForceMiniature.lance_id == Lance.id)
+                .where(
+                    ForceMiniature.force_id == lance.force_id,
+                    ForceMiniature.miniature_id == miniature_id,
+                )
+            ).scalar()
+            return {
+                "success": False,
+                "error": f"Miniature already in force (Lance: {lance_name or 'Unnamed'})",
+            }
 
-        return {"success": True, "force_miniature_id": fm.id}
+        return {"success": True, "force_miniature_id": fm_id}
 
 
+@_invalidates_active_force
+@retry_on_busy
 def remove_miniature_from_force(miniature_id: int, force_id: int) -> bool:
     """Remove a miniature from any lance in the force."""
     with session_scope() as session:
-        deleted = (
-            session.query(ForceMiniature)
-            .join(Lance)
-            .filter(and_(Lance.force_id == force_id, ForceMiniature.miniature_id == miniature_id))
-            .delete(synchronize_session=False)
-        )
+        deleted = session.execute(
+            delete(ForceMiniature).where(
+                ForceMiniature.force_id == force_id, ForceMiniature.miniature_id == miniature_id
+            )
+        ).rowcount
         return deleted > 0
 
 
+@_invalidates_active_force
+@retry_on_busy
 def move_miniature_between_lances(
     miniature_id: int, target_lance_id: int, position: int
 ) -> dict[str, Any]:
@@ -176,30 +328,22 @@ def move_miniature_between_lances(
         if not target_lance:
             return {"success": False, "error": "Target lance not found"}
 
-        # Find existing assignment
-        fm = (
-            session.query(ForceMiniature)
-            .join(Lance)
-            .filter(
-                and_(
-                    Lance.force_id == target_lance.force_id,
-                    ForceMiniature.miniature_id == miniature_id,
-                )
+        moved = session.execute(
+            update(ForceMiniature)
+            .where(
+                ForceMiniature.force_id == target_lance.force_id,
+                ForceMiniature.miniature_id == miniature_id,
             )
-            .first()
-        )
-
-        if not fm:
+            .values(lance_id=target_lance_id, order=position)
+        ).rowcount
+        if not moved:
             return {"success": False, "error": "Miniature not in this force"}
 
-        # Update assignment
-        fm.lance_id = target_lance_id
-        fm.order = position
-        session.flush()
-
         return {"success": True}
 
 
+@_invalidates_active_force
+@retry_on_busy
 def create_empty_lance(force_id: int, name: str | None = None) -> Lance | None:
     """Create an empty lance in a force."""
     with session_scope() as session:
@@ -218,6 +362,144 @@ def create_empty_lance(force_id: int, name: str | None = None) -> Lance | None:
         return lance
 
 
+def _existing_miniature_ids(session: Session, miniature_ids: list[int]) -> set[int]:
+    if not miniature_ids:
+        return set()
+    return set(
+        session.execute(select(Miniature.id).where(Miniature.id.in_(miniature_ids))).scalars()
+    )
+
+
+@_invalidates_active_force
+@retry_on_busy
+def create_lance_with_miniatures(
+    force_id: int, name: str | None, miniature_ids: list[int]
+) -> dict[str, Any]:
+    """Create a lance holding ``miniature_ids`` (in that order) in one transaction.
+
+    All assignments go in with a single insert, numbered from 1 like
+    ``add_miniature_to_lance``. Miniatures already in the force (``uix_force_miniature``)
+    or deleted since they were matched are reported in ``skipped``.
+    """
+    with session_scope() as session:
+        if not session.get(Force, force_id):
+            return {"success": False, "error": "Force not found"}
+
+        max_order = (
+            session.query(func.max(Lance.order)).filter(Lance.force_id == force_id).scalar()
+        ) or 0
+        lance = Lance(force_id=force_id, name=name, order=max_order + 1)
+        session.add(lance)
+        session.flush()
+
+        # Matching ran before this transaction; drop miniatures deleted in the meantime
+        existing = _existing_miniature_ids(session, miniature_ids)
+        rows = [
+            {
+                "force_id": force_id,
+                "lance_id": lance.id,
+                "miniature_id": miniature_id,
+                "order": position,
+            }
+            for position, miniature_id in enumerate((m for m in miniature_ids if m in existing), 1)
+        ]
+        added: set[int] = set()
+        if rows:
+            added = set(
+                session.execute(
+                    sqlite_insert(ForceMiniature)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["force_id", "miniature_id"])
+                    .returning(ForceMiniature.miniature_id)
+                ).scalars()
+            )
+
+        return {
+            "success": True,
+            "lance_id": lance.id,
+            "added": [m for m in miniature_ids if m in added],
+            "skipped": [m for m in miniature_ids if m not in added],
+        }
+
+
+@_invalidates_active_force
+@retry_on_busy
+def create_force_with_lances(
+    name: str, lances: list[tuple[str | None, list[int]]]
+) -> dict[str, Any]:
+    """Create an active force with ``lances`` ((name, miniature ids) each) in one transaction.
+
+    The lances go in with one insert and every assignment with another, so the force
+    appears complete or not at all. A miniature listed in more than one lance is kept in
+    the first only (``uix_force_miniature``); it, and any miniature deleted since it was
+    matched, is counted in ``skipped``.
+    """
+    with session_scope() as session:
+        _deactivate_current_force(session)
+        force = Force(name=name, is_active=True)
+        session.add(force)
+        session.flush()
+
+        lance_ids: list[int] = []
+        if lances:
+            lance_ids = list(
+                session.execute(
+                    insert(Lance).returning(Lance.id, sort_by_parameter_order=True),
+                    [
+                        {"force_id": force.id, "name": lance_name, "order": position}
+                        for position, (lance_name, _) in enumerate(lances, 1)
+                    ],
+                ).scalars()
+            )
+
+        existing = _existing_miniature_ids(session, [m for _, ids in lances for m in ids])
+        rows = [
+            {
+                "force_id": force.id,
+                "lance_id": lance_id,
+                "miniature_id": miniature_id,
+                "order": position,
+            }
+            for lance_id, (_, miniature_ids) in zip(lance_ids, lances, strict=True)
+            for position, miniature_id in enumerate((m for m in miniature_ids if m in existing), 1)
+        ]
+        listed = sum(len(ids) for _, ids in lances)
+        added = 0
+        if rows:
+            added = len(
+                session.execute(
+                    sqlite_insert(ForceMiniature)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=["force_id", "miniature_id"])
+                    .returning(ForceMiniature.id)
+                ).all()
+            )
+
+        return {
+            "success": True,
+            "force_id": force.id,
+            "lance_ids": lance_ids,
+            "added": added,
+            "skipped": listed - added,
+        }
+
+
+@_invalidates_active_force
+@retry_on_busy
+def rename_lance(force_id: int, lance_id: int, new_name: str | None) -> Lance | None:
+    """Rename a lance, returning None if it does not belong to the force."""
+    with session_scope() as session:
+        lance = session.get(Lance, lance_id)
+        if not lance or lance.force_id != force_id:
+            return None
+
+        lance.name = new_name
+        session.flush()
+        return lance
+
+
+@_invalidates_active_force
+@retry_on_busy
 def delete_lance(lance_id: int) -> bool:
     """Delete a lance and unassign all miniatures."""
     with session_scope() as session:
@@ -230,8 +512,8 @@ def delete_lance(lance_id: int) -> bool:
 
 def get_miniatures_in_force(force_id: int) -> set[int]:
     """Get set of miniature IDs currently in the force."""
-    with session_scope() as session:
-        stmt = select(ForceMiniature.miniature_id).join(Lance).where(Lance.force_id == force_id)
+    with session_scope(read_only=True) as session:
+        stmt = select(ForceMiniature.miniature_id).where(ForceMiniature.force_id == force_id)
         return set(session.execute(stmt).scalars().all())
 
 
@@ -282,8 +564,13 @@ def export_force_to_json(force_id: int, directory: str = "forces/") -> Path:
 
 def import_force_from_json(file_path: str) -> dict[str, Any]:
     """Import force from JSON file, matching miniatures by series+unique_id."""
-    filepath = Path(file_path)
-    data = json.loads(filepath.read_text(encoding="utf-8"))
+    with Path(file_path).open("rb") as f:
+        return import_force_from_stream(f)
+
+
+def import_force_from_stream(stream: IO[bytes]) -> dict[str, Any]:
+    """Import force from a binary JSON stream such as an upload, without saving it first."""
+    data = json.load(stream)
 
     force_name = data.get("force_name", "Imported Force")
 
@@ -296,6 +583,7 @@ def import_force_from_json(file_path: str) -> dict[str, Any]:
         missing_miniatures = []
         imported_count = 0
 
+        assigned: set[int] = set()
         for lance_data in data.get("lances", []):
             lance = Lance(
                 force_id=force.id, name=lance_data.get("name"), order=lance_data.get("order", 0)
@@ -316,8 +604,13 @@ def import_force_from_json(file_path: str) -> dict[str, Any]:
                     .first()
                 )
 
+                if miniature and miniature.id in assigned:
+                    # A miniature can only be in one lance of the force; keep the first
+                    continue
                 if miniature:
+                    assigned.add(miniature.id)
                     fm = ForceMiniature(
+                        force_id=force.id,
                         lance_id=lance.id,
                         miniature_id=miniature.id,
                         order=mini_data.get("order", 0),
@@ -0,0 +1,400 @@
+"""In-process background jobs for long imports and exports.
+
+Each job is a row in the ``jobs`` table and runs on a small thread pool, so the request
+that enqueues it returns at once. Handlers registered with ``job_handler`` receive a
+``JobContext`` for their parameters, uploaded file, progress reports and result file.
+
+Several processes (WSGI workers) may share the table. Each job records the worker that
+owns it, and every worker heartbeats the jobs it has queued or is running; jobs nobody
+heartbeats are failed as orphaned, including one whose final status write failed.
+Finished jobs and their files are deleted after ``JOB_RETENTION`` seconds.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, NamedTuple
+
+from flask import Flask
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import OperationalError
+
+from .. import extensions
+from ..extensions import is_busy_error, retry_on_busy, session_scope
+from ..models.job import Job
+from . import force_service, lance_template_service, miniature_service
+from .streaming import chunked, gzip_chunks
+
+# Minimum seconds between progress writes to the jobs table
+PROGRESS_INTERVAL = 0.5
+
+
+class _Handler(NamedTuple):
+    func: Callable[[JobContext], None]
+    needs_upload: bool
+
+
+_handlers: dict[str, _Handler] = {}
+_executor: ThreadPoolExecutor | None = None
+_app: Flask | None = None
+_heartbeat_stop: threading.Event | None = None
+# (pid, id): regenerated in a forked child so each worker process has its own id
+_worker: tuple[int, str] | None = None
+# Ids of the jobs this process has queued or is running, i.e. the ones it heartbeats
+_live_jobs: set[str] = set()
+_live_jobs_lock = threading.Lock()
+
+_ACTIVE = ("queued", "running")
+
+
+def job_handler(kind: str, needs_upload: bool = False) -> Callable:
+    """Register the decorated function as the handler for jobs of ``kind``."""
+
+    def register(func: Callable[[JobContext], None]) -> Callable[[JobContext], None]:
+        _handlers[kind] = _Handler(func, needs_upload)
+        return func
+
+    return register
+
+
+def has_handler(kind: str) -> bool:
+    return kind in _handlers
+
+
+class JobContext:
+    """What a running handler can see and report about its job."""
+
+    def __init__(self, job_id: str, params: dict[str, Any], work_dir: Path) -> None:
+        self.job_id = job_id
+        self.params = params
+        self.work_dir = work_dir
+        self.message: str | None = None
+        self._last_progress = 0.0
+
+    @property
+    def upload_path(self) -> Path:
+        return self.work_dir / f"{self.job_id}.upload"
+
+    @property
+    def scratch_dir(self) -> Path:
+        """A directory private to this job for intermediate files, removed when it ends."""
+        path = self.work_dir / f"{self.job_id}.tmp"
+        path.mkdir(exist_ok=True)
+        return path
+
+    def flag(self, name: str) -> bool:
+        """Interpret a form-style parameter ("on", "true", "1") as a boolean."""
+        return str(self.params.get(name, "")).lower() in ("on", "true", "1")
+
+    def progress(self, done: int, total: int | None = None) -> None:
+        """Record progress, throttled so chatty handlers do not flood the database."""
+        now = time.monotonic()
+        complete = total is not None and done >= total
+        if not complete and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        _update_job(self.job_id, progress=done, total=total)
+
+    def result_file(self, name: str, mimetype: str) -> Path:
+        """Register ``name`` as the job's download and return the path to write it to."""
+        path = self.work_dir / f"{self.job_id}.result"
+        _update_job(self.job_id, result_path=str(path), result_name=name, result_mimetype=mimetype)
+        return path
+
+
+def init_jobs(app: Flask) -> None:
+    """Configure the job runner for ``app``, failing orphaned jobs and purging old ones."""
+    global _app, _executor, _heartbeat_stop
+    _app = app
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+    if _heartbeat_stop is not None:
+        _heartbeat_stop.set()
+        _heartbeat_stop = None
+
+    Path(app.config["JOB_DIR"]).mkdir(parents=True, exist_ok=True)
+    fail_orphaned_jobs()
+    purge_expired_jobs()
+
+
+def worker_id() -> str:
+    """This process's id as recorded on the jobs it owns."""
+    global _worker
+    pid = os.getpid()
+    if _worker is None or _worker[0] != pid:
+        _worker = (pid, f"{pid}-{uuid.uuid4().hex[:12]}")
+    return _worker[1]
+
+
+def _live_job_ids() -> list[str]:
+    with _live_jobs_lock:
+        return list(_live_jobs)
+
+
+def _track(job_id: str, live: bool) -> None:
+    """Start or stop heartbeating ``job_id`` from this process."""
+    with _live_jobs_lock:
+        if live:
+            _live_jobs.add(job_id)
+        else:
+            _live_jobs.discard(job_id)
+
+
+def fail_orphaned_jobs() -> int:
+    """Fail queued/running jobs that no worker is heartbeating any more.
+
+    A job counts as orphaned once neither a heartbeat nor an update was recorded for
+    ``JOB_STALE_AFTER`` seconds; this process's own live jobs are never failed. Returns
+    the number of jobs failed.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=_app.config["JOB_STALE_AFTER"])
+    last_seen = func.coalesce(Job.heartbeat_at, Job.updated_at)
+    with session_scope() as session:
+        return session.execute(
+            update(Job)
+            .where(
+                Job.status.in_(_ACTIVE),
+                Job.id.not_in(_live_job_ids()),
+                last_seen < cutoff,
+            )
+            .values(status="failed", message="Interrupted: its worker process stopped")
+        ).rowcount
+
+
+def purge_expired_jobs() -> int:
+    """Delete finished jobs older than ``JOB_RETENTION`` and their files."""
+    cutoff = datetime.utcnow() - timedelta(seconds=_app.config["JOB_RETENTION"])
+    with session_scope() as session:
+        expired = session.execute(
+            select(Job.id, Job.result_path).where(
+                Job.status.not_in(_ACTIVE), Job.updated_at < cutoff
+            )
+        ).all()
+        if expired:
+            session.execute(delete(Job).where(Job.id.in_([job_id for job_id, _ in expired])))
+    for job_id, result_path in expired:
+        _remove_job_files(job_id, result_path)
+    return len(expired)
+
+
+def _remove_job_files(job_id: str, result_path: str | None) -> None:
+    if result_path:
+        Path(result_path).unlink(missing_ok=True)
+    (_work_dir() / f"{job_id}.upload").unlink(missing_ok=True)
+    shutil.rmtree(_work_dir() / f"{job_id}.tmp", ignore_errors=True)
+
+
+def _heartbeat() -> None:
+    """Mark this worker's live jobs as alive (skipped if the db is busy)."""
+    live = _live_job_ids()
+    if not live:
+        return
+    try:
+        with session_scope() as session:
+            session.execute(
+                update(Job)
+                .where(Job.id.in_(live), Job.status.in_(_ACTIVE))
+                # A heartbeat is not a change to the job
+                .values(heartbeat_at=datetime.utcnow(), updated_at=Job.updated_at)
+            )
+    except OperationalError as exc:
+        if not is_busy_error(exc):
+            raise
+
+
+def _heartbeat_loop(app: Flask, stop: threading.Event) -> None:
+    interval = app.config["JOB_HEARTBEAT_INTERVAL"]
+    while not stop.wait(interval):
+        with app.app_context():
+            _heartbeat()
+            fail_orphaned_jobs()
+            purge_expired_jobs()
+
+
+def _start_workers() -> ThreadPoolExecutor:
+    global _executor, _heartbeat_stop
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=_app.config["JOB_WORKERS"], thread_name_prefix="mechbay-job"
+        )
+        _heartbeat_stop = threading.Event()
+        threading.Thread(
+            target=_heartbeat_loop,
+            args=(_app, _heartbeat_stop),
+            name="mechbay-job-heartbeat",
+            daemon=True,
+        ).start()
+    return _executor
+
+
+def _work_dir() -> Path:
+    return Path(_app.config["JOB_DIR"])
+
+
+def _runs_inline() -> bool:
+    # An in-memory SQLite database is private to one connection, so worker threads
+    # could not see it; run jobs synchronously instead
+    return extensions.engine.url.database in (None, "", ":memory:")
+
+
+def enqueue(
+    kind: str, params: dict[str, Any] | None = None, upload: IO[bytes] | None = None
+) -> Job:
+    """Create a job and start it in the background, returning the queued job."""
+    handler = _handlers.get(kind)
+    if handler is None:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if handler.needs_upload and upload is None:
+        raise ValueError("This job needs an uploaded file")
+
+    job_id = uuid.uuid4().hex
+    if upload is not None:
+        with (_work_dir() / f"{job_id}.upload").open("wb") as target:
+            shutil.copyfileobj(upload, target)
+
+    with session_scope() as session:
+        job = Job(
+            id=job_id,
+            kind=kind,
+            status="queued",
+            params=json.dumps(params or {}),
+            worker_id=worker_id(),
+            heartbeat_at=datetime.utcnow(),
+        )
+        session.add(job)
+        session.flush()
+    _track(job_id, live=True)
+
+    if _runs_inline():
+        _run(job_id)
+        return get_job(job_id) or job
+
+    _start_workers().submit(_run, job_id)
+    return job
+
+
+def get_job(job_id: str) -> Job | None:
+    with session_scope(read_only=True) as session:
+        return session.get(Job, job_id)
+
+
+@retry_on_busy
+def _update_job(job_id: str, **values: Any) -> None:
+    """Write ``values`` to the job's row; a job that was purged meanwhile is ignored."""
+    with session_scope() as session:
+        session.execute(update(Job).where(Job.id == job_id).values(**values))
+
+
+@retry_on_busy
+def _start(job_id: str) -> tuple[str, dict[str, Any]] | None:
+    """Mark the job running on this worker, returning its kind and parameters."""
+    with session_scope() as session:
+        job = session.get(Job, job_id)
+        if not job:
+            return None
+        job.status = "running"
+        job.worker_id = worker_id()
+        job.heartbeat_at = datetime.utcnow()
+        return job.kind, json.loads(job.params or "{}")
+
+
+def _run(job_id: str) -> None:
+    with _app.app_context():
+        try:
+            started = _start(job_id)
+            if started is None:
+                return
+            kind, params = started
+            context = JobContext(job_id, params, _work_dir())
+            try:
+                _handlers[kind].func(context)
+            except Exception as exc:  # noqa: BLE001
+                status, message = "failed", str(exc)
+            else:
+                status, message = "succeeded", context.message
+            finally:
+                context.upload_path.unlink(missing_ok=True)
+                shutil.rmtree(context.work_dir / f"{job_id}.tmp", ignore_errors=True)
+        finally:
+            # Stop heartbeating first: if the final write fails for good, the job goes
+            # stale and is failed as orphaned instead of looking alive forever
+            _track(job_id, live=False)
+        _update_job(job_id, status=status, message=message)
+
+
+# --- Handlers --------------------------------------------------------------------------
+
+
+@job_handler("miniatures.import", needs_upload=True)
+def _import_miniatures(ctx: JobContext) -> None:
+    report = miniature_service.import_from_file(
+        str(ctx.upload_path),
+        merge=ctx.flag("merge"),
+        filename=ctx.params.get("filename"),
+        progress=ctx.progress,
+    )
+    ctx.message = f"Imported {report['imported']} miniatures"
+    if report["error_count"]:
+        details = "; ".join(f"record {e['record']}: {e['error']}" for e in report["errors"][:10])
+        ctx.message += f". Skipped {report['error_count']} invalid record(s): {details}"
+
+
+@job_handler("miniatures.export")
+def _export_miniatures(ctx: JobContext) -> None:
+    fmt = ctx.params.get("format", "json")
+    if fmt not in miniature_service.EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    iter_pieces, mimetype, extension = miniature_service.EXPORT_FORMATS[fmt]
+    body = chunked(iter_pieces(compact=ctx.flag("compact")) if fmt == "json" else iter_pieces())
+    name = f"miniatures.{extension}"
+    if ctx.flag("gzip"):
+        body = gzip_chunks(body)
+        name += ".gz"
+        mimetype = "application/gzip"
+
+    with ctx.result_file(name, mimetype).open("wb") as f:
+        for chunk in body:
+            f.write(chunk)
+    ctx.message = f"Exported {name}"
+
+
+@job_handler("forces.import", needs_upload=True)
+def _import_force(ctx: JobContext) -> None:
+    result = force_service.import_force_from_json(str(ctx.upload_path))
+    ctx.message = (
+        f"Imported force '{result['force_name']}' with {result['imported_count']} miniatures"
+    )
+    if result["missing_miniatures"]:
+        ctx.message += f". Missing: {', '.join(result['missing_miniatures'])}"
+
+
+@job_handler("forces.export")
+def _export_force(ctx: JobContext) -> None:
+    filepath = force_service.export_force_to_json(int(ctx.params["force_id"]), str(ctx.scratch_dir))
+    filepath.replace(ctx.result_file(filepath.name, "application/json"))
+    ctx.message = f"Exported {filepath.name}"
+
+
+@job_handler("lance_templates.import", needs_upload=True)
+def _import_templates(ctx: JobContext) -> None:
+    result = lance_template_service.import_templates_from_json(str(ctx.upload_path))
+    ctx.message = (
+        f"Imported {result['imported_count']} template(s). Skipped {result['skipped_count']}."
+    )
+
+
+@job_handler("lance_templates.export")
+def _export_templates(ctx: JobContext) -> None:
+    filepath = lance_template_service.export_templates_to_json(str(ctx.scratch_dir))
+    filepath.replace(ctx.result_file(filepath.name, "application/json"))
+    ctx.message = f"Exported {filepath.name}"
@@ -1,40 +1,71 @@
 from __future__ import annotations
 
 import json
+from collections.abc import Iterable
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, NamedTuple
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Engine, select
+from sqlalchemy.orm import Session
 
-from ..extensions import session_scope
+from .. import extensions
+from ..extensions import retry_on_busy, session_scope
 from ..models.lance_template import LanceTemplate
 from ..models.lance_template_miniature import LanceTemplateMiniature
 from ..models.miniature import Miniature
-
-
-def get_all_templates() -> list[LanceTemplate]:
+from . import force_service
+from .chassis_index import ChassisIndex, Variant, get_chassis_index
+from .matching import assign_by_counts, assign_slots
+from .read_models import (
+    MINIATURE_COLUMNS,
+    PATTERN_COLUMNS,
+    TEMPLATE_COLUMNS,
+    MiniatureView,
+    PatternView,
+    TemplateView,
+)
+from .version_service import get_versions
+
+# Forces x data versions whose template feasibility is kept
+FEASIBILITY_CACHE_SIZE = 64
+
+
+def _load_template_views(session: Session, *criteria: ColumnElement[bool]) -> list[TemplateView]:
+    """Build template read models in two column-only queries (templates, patterns)."""
+    templates = session.execute(
+        select(*TEMPLATE_COLUMNS).where(*criteria).order_by(LanceTemplate.name)
+    ).all()
+    if not templates:
+        return []
+
+    patterns: dict[int, list[PatternView]] = {}
+    rows = session.execute(
+        select(*PATTERN_COLUMNS)
+        .where(LanceTemplateMiniature.template_id.in_([t.id for t in templates]))
+        .order_by(LanceTemplateMiniature.template_id, LanceTemplateMiniature.order)
+    )
+    for template_id, chassis_pattern, order in rows:
+        patterns.setdefault(template_id, []).append(PatternView(chassis_pattern, order))
+
+    return [TemplateView(*t, miniatures=tuple(patterns.get(t.id, ()))) for t in templates]
+
+
+def get_all_templates() -> list[TemplateView]:
     """Get all available lance templates."""
-    with session_scope() as session:
-        stmt = select(LanceTemplate).order_by(LanceTemplate.name)
-        templates = list(session.execute(stmt).scalars().all())
-        # Eager load miniatures and expunge to detach from session
-        for template in templates:
-            _ = template.miniatures
-            session.expunge(template)
-        return templates
+    with session_scope(read_only=True) as session:
+        return _load_template_views(session)
 
 
-def get_template_details(template_id: int) -> LanceTemplate | None:
+def get_template_details(template_id: int) -> TemplateView | None:
     """Get template with all miniature patterns."""
-    with session_scope() as session:
-        template = session.get(LanceTemplate, template_id)
-        if template:
-            _ = template.miniatures
-            session.expunge(template)
-        return template
+    with session_scope(read_only=True) as session:
+        views = _load_template_views(session, LanceTemplate.id == template_id)
+        return views[0] if views else None
 
 
+@retry_on_busy
 def create_template(
     name: str, chassis_patterns: list[str], description: str | None = None
 ) -> LanceTemplate:
@@ -55,6 +86,7 @@ def create_template(
         return template
 
 
+@retry_on_busy
 def update_template(
     template_id: int, name: str, chassis_patterns: list[str], description: str | None = None
 ) -> LanceTemplate | None:
@@ -84,6 +116,7 @@ def update_template(
         return template
 
 
+@retry_on_busy
 def delete_template(template_id: int) -> bool:
     """Delete a lance template."""
     with session_scope() as session:
@@ -96,18 +129,30 @@ def delete_template(template_id: int) -> bool:
 
 def find_matching_miniature(
     chassis_pattern: str, exclude_ids: set[int] | None = None
-) -> Miniature | None:
+) -> MiniatureView | None:
     """Find first available miniature matching chassis pattern (partial match)."""
-    if exclude_ids is None:
-        exclude_ids = set()
+    miniature_id = get_chassis_index().first_match(chassis_pattern, exclude_ids or ())
+    if miniature_id is None:
+        return None
+    return _load_miniature_views({miniature_id})[miniature_id]
 
-    with session_scope() as session:
-        stmt = select(Miniature).where(Miniature.chassis.like(f"%{chassis_pattern}%"))
 
-        if exclude_ids:
-            stmt = stmt.where(Miniature.id.not_in(exclude_ids))
+def _load_miniature_views(ids: set[int]) -> dict[int, MiniatureView]:
+    if not ids:
+        return {}
+    with session_scope(read_only=True) as session:
+        rows = session.execute(select(*MINIATURE_COLUMNS).where(Miniature.id.in_(ids)))
+        return {row.id: MiniatureView._make(row) for row in rows}
 
-        return session.execute(stmt).scalars().first()
+
+def _match_patterns(
+    index: ChassisIndex, patterns: list[str], exclude_ids: set[int]
+) -> tuple[list[tuple[str, int]], list[str]]:
+    """Fill as many pattern slots as possible (maximum matching), in template order."""
+    assignment = assign_slots(index, patterns, exclude_ids)
+    matched = [(p, mid) for p, mid in zip(patterns, assignment, strict=True) if mid is not None]
+    missing = [p for p, mid in zip(patterns, assignment, strict=True) if mid is None]
+    return matched, missing
 
 
 def match_template_miniatures(
@@ -116,29 +161,145 @@ def match_template_miniatures(
     """Match template patterns to available miniatures.
 
     Returns dict with:
-    - matched: list of (chassis_pattern, miniature_id) tuples
+    - matched: list of (chassis_pattern, miniature_id, miniature) tuples
     - missing: list of chassis_pattern strings
     """
-    if exclude_ids is None:
-        exclude_ids = set()
-
     template = get_template_details(template_id)
     if not template:
         return {"matched": [], "missing": []}
+    return match_all_templates(exclude_ids, templates=[template])[template.id]
 
-    matched = []
-    missing = []
-    used_ids = set(exclude_ids)
 
-    for tm in template.miniatures:
-        miniature = find_matching_miniature(tm.chassis_pattern, used_ids)
-        if miniature:
-            matched.append((tm.chassis_pattern, miniature.id, miniature))
-            used_ids.add(miniature.id)
-        else:
-            missing.append(tm.chassis_pattern)
+def match_all_templates(
+    exclude_ids: set[int] | None = None, templates: list[TemplateView] | None = None
+) -> dict[int, dict[str, Any]]:
+    """Match every template (or ``templates``) independently against the same inventory.
 
-    return {"matched": matched, "missing": missing, "template_name": template.name}
+    Patterns are matched in memory through the chassis index; the matched miniatures are
+    then loaded in one query. Results are keyed by template id, in the
+    ``match_template_miniatures`` format.
+    """
+    if templates is None:
+        templates = get_all_templates()
+    index = get_chassis_index()
+
+    results = {}
+    for template in templates:
+        matched, missing = _match_patterns(
+            index, [tm.chassis_pattern for tm in template.miniatures], exclude_ids or set()
+        )
+        results[template.id] = {
+            "matched": matched,
+            "missing": missing,
+            "template_name": template.name,
+        }
+
+    views = _load_miniature_views({mid for r in results.values() for _, mid in r["matched"]})
+    for result in results.values():
+        result["matched"] = [(pattern, mid, views[mid]) for pattern, mid in result["matched"]]
+    return results
+
+
+def match_templates_jointly(
+    template_ids: list[int], exclude_ids: set[int] | None = None
+) -> dict[str, Any]:
+    """Match an ordered list of templates (one lance each) against one shared inventory.
+
+    Unlike calling ``match_template_miniatures`` lance by lance, every slot of every
+    lance is solved in a single maximum matching, so an early lance never takes a
+    miniature a later lance needed when another would have done. Earlier lances still
+    get first pick among equally full assignments. A template may be listed more than
+    once.
+
+    Returns dict with:
+    - lances: one dict per template id, in order, with template_id, template_name,
+      matched (chassis_pattern, miniature_id, miniature) tuples and missing patterns
+    - unknown: template ids that do not exist (they get no lance)
+    """
+    with session_scope(read_only=True) as session:
+        templates = {
+            t.id: t for t in _load_template_views(session, LanceTemplate.id.in_(set(template_ids)))
+        }
+    lance_templates = [templates[tid] for tid in template_ids if tid in templates]
+    patterns = [tm.chassis_pattern for t in lance_templates for tm in t.miniatures]
+    assignment = assign_slots(get_chassis_index(), patterns, exclude_ids or ())
+    views = _load_miniature_views({mid for mid in assignment if mid is not None})
+
+    lances = []
+    slots = iter(zip(patterns, assignment, strict=True))
+    for template in lance_templates:
+        lance_slots = [next(slots) for _ in template.miniatures]
+        lances.append(
+            {
+                "template_id": template.id,
+                "template_name": template.name,
+                "matched": [(p, mid, views[mid]) for p, mid in lance_slots if mid is not None],
+                "missing": [p for p, mid in lance_slots if mid is None],
+            }
+        )
+    return {"lances": lances, "unknown": [tid for tid in template_ids if tid not in templates]}
+
+
+class TemplateFeasibility(NamedTuple):
+    """How much of a template the available inventory can fill."""
+
+    template_id: int
+    name: str
+    slots: int
+    fillable: int
+    missing: tuple[str, ...]
+
+    @property
+    def complete(self) -> bool:
+        return self.fillable == self.slots
+
+
+def template_feasibility(exclude_ids: Iterable[int] = ()) -> list[TemplateFeasibility]:
+    """For every template, how many slots a maximum matching could fill.
+
+    One pass builds a count of available miniatures per index variant (chassis and
+    prefix); each distinct pattern is resolved to variants once, shared by all templates,
+    and every template is then matched against the counts without touching individual
+    miniatures.
+    """
+    templates = get_all_templates()
+    index = get_chassis_index()
+    counts = index.count_table(exclude_ids)
+
+    variants: dict[str, list[Variant]] = {}
+    results = []
+    for template in templates:
+        patterns = [tm.chassis_pattern for tm in template.miniatures]
+        for pattern in patterns:
+            if pattern not in variants:
+                variants[pattern] = sorted(
+                    v for v in index.variants_matching(pattern) if counts.get(v)
+                )
+        assignment = assign_by_counts([variants[p] for p in patterns], counts)
+        missing = tuple(p for p, v in zip(patterns, assignment, strict=True) if v is None)
+        results.append(
+            TemplateFeasibility(
+                template.id, template.name, len(patterns), len(patterns) - len(missing), missing
+            )
+        )
+    return results
+
+
+def force_template_feasibility(force_id: int) -> tuple[TemplateFeasibility, ...]:
+    """``template_feasibility`` against the inventory not yet in the force, cached.
+
+    Results are cached per force and per miniatures/forces/templates data version, so
+    they are recomputed only after something they depend on changed.
+    """
+    versions = get_versions("miniatures", "forces", "lance_templates")
+    return _cached_force_feasibility(extensions.engine, force_id, versions)
+
+
+@lru_cache(maxsize=FEASIBILITY_CACHE_SIZE)
+def _cached_force_feasibility(
+    engine: Engine, force_id: int, versions: tuple[int, ...]
+) -> tuple[TemplateFeasibility, ...]:
+    return tuple(template_feasibility(force_service.get_miniatures_in_force(force_id)))
 
 
 def export_templates_to_json(directory: str = "lance_templates/") -> Path:
@@ -183,11 +344,15 @@ def import_templates_from_json(file_path: str) -> dict[str, Any]:
     if not filepath.exists():
         raise ValueError(f"File not found: {file_path}")
 
-    # Read JSON file
-    with filepath.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+    with filepath.open("rb") as f:
+        return import_templates_from_stream(f)
+
+
+def import_templates_from_stream(stream: IO[bytes]) -> dict[str, Any]:
+    """Import lance templates from a binary JSON stream such as an upload."""
+    data = json.load(stream)
 
-    if "templates" not in data:
+    if not isinstance(data, dict) or "templates" not in data:
         raise ValueError("Invalid lance templates file format")
 
     imported_count = 0
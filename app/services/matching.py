@@ -0,0 +1,164 @@
+"""Maximum bipartite matching of template slots to miniatures.
+
+Greedy matching (each slot takes its first free candidate, in order) can strand a slot:
+"Hawk" may take the only "Shadow Hawk" that a later slot needed. ``hopcroft_karp`` finds
+a maximum matching instead, in O(E * sqrt(V)).
+
+Candidate lists are in preference order. The matching is seeded greedily in that order
+and Hopcroft-Karp then only re-routes what it must to fill more slots, so preferred
+candidates are kept wherever that costs nothing. Trimming each slot to as many candidates
+as there are slots (``max_candidates``) never reduces the matching size: a slot with that
+many candidates can always find one its rivals do not use. That keeps large inventories
+cheap.
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import Counter, deque
+from collections.abc import Hashable, Iterable, Mapping, Sequence
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .chassis_index import ChassisIndex, IndexedMiniature
+
+_INFINITY = float("inf")
+
+
+def max_candidates(slot_count: int) -> int:
+    """How many candidates per slot are enough to find a maximum matching."""
+    return max(slot_count, 1)
+
+
+def hopcroft_karp[R: Hashable](adjacency: Sequence[Sequence[R]]) -> list[R | None]:
+    """Match left vertices ``0..n-1`` to right vertices, maximizing the matched count.
+
+    ``adjacency[i]`` lists the right vertices left vertex ``i`` may take, most preferred
+    first. Returns, for each left vertex, its matched right vertex or None.
+    """
+    match_left: list[R | None] = [None] * len(adjacency)
+    match_right: dict[R, int] = {}
+
+    # Greedy seed in preference order; usually most of the final matching
+    for left, candidates in enumerate(adjacency):
+        for right in candidates:
+            if right not in match_right:
+                match_left[left] = right
+                match_right[right] = left
+                break
+
+    while True:
+        # BFS from the free left vertices, layering the graph by alternating path length
+        distance = [_INFINITY] * len(adjacency)
+        queue = deque()
+        for left, right in enumerate(match_left):
+            if right is None and adjacency[left]:
+                distance[left] = 0
+                queue.append(left)
+        found = False
+        while queue:
+            left = queue.popleft()
+            for right in adjacency[left]:
+                owner = match_right.get(right)
+                if owner is None:
+                    found = True
+                elif distance[owner] == _INFINITY:
+                    distance[owner] = distance[left] + 1
+                    queue.append(owner)
+        if not found:
+            return match_left
+
+        # DFS along the layers for vertex-disjoint shortest augmenting paths
+        for start in range(len(adjacency)):
+            if match_left[start] is None and distance[start] == 0:
+                _augment(start, adjacency, distance, match_left, match_right)
+
+
+def _augment[R: Hashable](
+    start: int,
+    adjacency: Sequence[Sequence[R]],
+    distance: list[float],
+    match_left: list[R | None],
+    match_right: dict[R, int],
+) -> bool:
+    """Find and flip one augmenting path from ``start`` (iterative, no recursion limit)."""
+    # Each frame: (left vertex, index of its next candidate); path holds chosen rights
+    stack = [(start, 0)]
+    path: list[R] = []
+    while stack:
+        left, position = stack[-1]
+        candidates = adjacency[left]
+        if position == len(candidates):
+            # Dead end: never revisit this vertex in this phase
+            distance[left] = _INFINITY
+            stack.pop()
+            if path:
+                path.pop()
+            continue
+        stack[-1] = (left, position + 1)
+        right = candidates[position]
+        owner = match_right.get(right)
+        if owner is None:
+            path.append(right)
+            for (path_left, _), path_right in zip(stack, path, strict=True):
+                match_left[path_left] = path_right
+                match_right[path_right] = path_left
+            return True
+        if distance[owner] == distance[left] + 1:
+            path.append(right)
+            stack.append((owner, 0))
+    return False
+
+
+def assign_slots(
+    index: ChassisIndex, patterns: Sequence[str], exclude_ids: Iterable[int] = ()
+) -> list[int | None]:
+    """Give as many ``patterns`` (template slots) as possible a distinct miniature.
+
+    Among equally full assignments, miniatures from the tray that can serve the most
+    slots are preferred, then the lowest ``unique_id``. Returns the miniature id for each
+    slot, or None where no assignment fills it.
+    """
+    excluded = set(exclude_ids)
+    candidates = {
+        pattern: [m for m in index.match_entries(pattern) if m.id not in excluded]
+        for pattern in set(patterns)
+    }
+
+    # Trays ranked by how many slots they could serve
+    coverage: Counter[str | None] = Counter()
+    for pattern in patterns:
+        coverage.update({m.tray_id for m in candidates[pattern]})
+    coverage.pop(None, None)
+
+    def preference(miniature: IndexedMiniature) -> tuple:
+        return (-coverage.get(miniature.tray_id, 0), miniature.unique_id, miniature.id)
+
+    limit = max_candidates(len(patterns))
+    ranked = {
+        pattern: [m.id for m in heapq.nsmallest(limit, entries, key=preference)]
+        for pattern, entries in candidates.items()
+    }
+    return hopcroft_karp([ranked[pattern] for pattern in patterns])
+
+
+def assign_by_counts[K: Hashable](
+    slot_keys: Sequence[Sequence[K]], counts: Mapping[K, int]
+) -> list[K | None]:
+    """Maximum matching of slots to inventory keys, each available ``counts[key]`` times.
+
+    The inventory is only counted, not enumerated: every key (an index variant, say)
+    contributes as many interchangeable copies as it has miniatures (capped like any
+    candidate list), so the graph stays small however many miniatures share a key.
+    Returns the key assigned to each slot, or None.
+    """
+    limit = max_candidates(len(slot_keys))
+    adjacency = []
+    for keys in slot_keys:
+        copies: list[tuple[K, int]] = []
+        for key in keys:
+            copies.extend((key, copy) for copy in range(min(counts.get(key, 0), limit)))
+            if len(copies) >= limit:
+                break
+        adjacency.append(copies[:limit])
+    return [None if right is None else right[0] for right in hopcroft_karp(adjacency)]
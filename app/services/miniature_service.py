@@ -1,13 +1,246 @@
 from __future__ import annotations
 
+import base64
+import csv
+import io
 import json
-from collections.abc import Iterable, Sequence
+import re
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from pathlib import Path
+from typing import IO, Any, NamedTuple, TextIO
 
-from sqlalchemy import and_, or_, select
+from sqlalchemy import (
+    ColumnElement,
+    Connection,
+    Select,
+    column,
+    delete,
+    func,
+    or_,
+    select,
+    table,
+    text,
+    tuple_,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from ..extensions import session_scope
+from .. import extensions
+from ..extensions import retry_on_busy, session_scope
+from ..models.force_miniature import ForceMiniature
 from ..models.miniature import Miniature
+from . import chassis_index, force_service
+from .read_models import MINIATURE_COLUMNS, MiniatureView
+from .streaming import chunked, iter_json_array, text_stream
+from .version_service import read_versions
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Sortable columns; nullable ones are coalesced so keyset comparisons never see NULL
+_SORT_COLUMNS = {
+    "series": Miniature.series,
+    "unique_id": Miniature.unique_id,
+    "prefix": Miniature.prefix,
+    "chassis": Miniature.chassis,
+    "type": Miniature.type,
+    "status": func.coalesce(Miniature.status, ""),
+    "tray_id": func.coalesce(Miniature.tray_id, ""),
+}
+
+
+# Lightweight handle on the FTS5 index created by migration 1
+_search_index = table("miniatures_fts", column("rowid"), column("rank"), column("miniatures_fts"))
+
+# Search tokens: "quoted phrases" or bare words
+_TOKEN_RE = re.compile(r'"([^"]+)"|(\S+)')
+_RANGE_RE = re.compile(r"^(\d+)-(\d+)$")
+# The trigram tokenizer cannot match substrings shorter than three characters
+_MIN_INDEXED_TOKEN = 3
+
+
+def _fts_phrase(token: str) -> str:
+    return '"' + token.replace('"', '""') + '"'
+
+
+def _fts_match(tokens: list[str]) -> ColumnElement[bool]:
+    return _search_index.c.miniatures_fts.match(" AND ".join(_fts_phrase(t) for t in tokens))
+
+
+def _like_any(token: str) -> ColumnElement[bool]:
+    like = f"%{token}%"
+    return or_(
+        Miniature.prefix.ilike(like),
+        Miniature.chassis.ilike(like),
+        Miniature.type.ilike(like),
+        Miniature.series.ilike(like),
+    )
+
+
+def _apply_search(stmt: Select, search_query: str) -> tuple[Select, ColumnElement | None]:
+    """Restrict ``stmt`` to rows matching every search token.
+
+    Tokens are ANDed together. ``1000-1100`` selects a unique_id range, a bare number also
+    matches unique_id exactly, and text is answered from the FTS5 trigram index where the
+    database supports it. Returns the statement plus a relevance column to order by, if any.
+    """
+    use_index = extensions.engine is not None and extensions.engine.dialect.name == "sqlite"
+    indexed: list[str] = []
+
+    def text_match(token: str) -> ColumnElement[bool]:
+        if use_index and len(token) >= _MIN_INDEXED_TOKEN:
+            hits = select(_search_index.c.rowid).where(_fts_match([token]))
+            return Miniature.id.in_(hits)
+        return _like_any(token)
+
+    for quoted, bare in _TOKEN_RE.findall(search_query):
+        token = (quoted or bare).strip()
+        if not token:
+            continue
+        # Quoted phrases are always text, never numbers or ranges
+        if not quoted and (match := _RANGE_RE.match(token)):
+            low, high = sorted((int(match.group(1)), int(match.group(2))))
+            stmt = stmt.where(Miniature.unique_id.between(low, high))
+            continue
+        if not quoted and token.isdigit():
+            stmt = stmt.where(or_(Miniature.unique_id == int(token), text_match(token)))
+            continue
+
+        if use_index and len(token) >= _MIN_INDEXED_TOKEN:
+            indexed.append(token)
+        else:
+            stmt = stmt.where(_like_any(token))
+
+    if not indexed:
+        return stmt, None
+
+    # One MATCH for all text tokens, joined so bm25 rank is available for ordering
+    hits = (
+        select(_search_index.c.rowid.label("id"), _search_index.c.rank.label("rank"))
+        .where(_fts_match(indexed))
+        .subquery("search_hits")
+    )
+    return stmt.join(hits, hits.c.id == Miniature.id), hits.c.rank
+
+
+def _filtered_select(
+    search_query: str | None, series_filter: str | None
+) -> tuple[Select, ColumnElement | None]:
+    """Build the base miniature select with the series filter and search applied.
+
+    Also returns the search relevance column when the query used the full-text index.
+    """
+    stmt = select(*MINIATURE_COLUMNS)
+    rank = None
+
+    # Series filter
+    if series_filter and series_filter != "All":
+        stmt = stmt.where(Miniature.series == series_filter)
+
+    # Search query
+    if search_query:
+        stmt, rank = _apply_search(stmt, search_query)
+
+    return stmt, rank
+
+
+def _sort_keys(
+    sort: str | None, direction: str | None, rank: ColumnElement | None = None
+) -> tuple[list[ColumnElement], bool]:
+    """Return the ordered key expressions (always ending in ``id``) and whether they descend."""
+    if sort in _SORT_COLUMNS:
+        return [_SORT_COLUMNS[sort], Miniature.id], direction == "desc"
+    if rank is not None:
+        # Unsorted searches list the best matches first (bm25 rank: lower is better)
+        return [rank, Miniature.id], False
+    # Default sort: series ASC, then unique_id ASC
+    return [Miniature.series, Miniature.unique_id, Miniature.id], False
+
+
+def _encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, width: int) -> list[Any] | None:
+    """Decode a cursor produced by ``_encode_cursor``; invalid cursors yield ``None``."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != width:
+        return None
+    if not all(_is_sql_scalar(value) for value in values):
+        return None
+    return values
+
+
+# SQLite INTEGER is a signed 64-bit value
+_SQLITE_INTEGER_RANGE = range(-(2**63), 2**63)
+
+
+def _is_sql_scalar(value: Any) -> bool:
+    """Whether ``value`` can be bound as a SQLite parameter (text, number or NULL)."""
+    if isinstance(value, int):
+        return value in _SQLITE_INTEGER_RANGE
+    return value is None or isinstance(value, str | float)
+
+
+# Leading columns of a page row that form the MiniatureView; sort keys follow them
+_VIEW_WIDTH = len(MINIATURE_COLUMNS)
+
+
+class MiniaturePage:
+    """A keyset page of miniatures that is streamed from the database while iterated.
+
+    ``next_cursor`` is filled in once iteration finishes and is ``None`` on the last page.
+    """
+
+    def __init__(self, stmt: Select, keys: list[ColumnElement], page_size: int) -> None:
+        self._stmt = stmt
+        self._keys = keys
+        self.page_size = page_size
+        self.next_cursor: str | None = None
+
+    def __iter__(self) -> Iterator[MiniatureView]:
+        self.next_cursor = None
+        stmt = (
+            self._stmt.add_columns(*self._keys)
+            .limit(self.page_size + 1)
+            .execution_options(yield_per=min(self.page_size + 1, 100))
+        )
+        with session_scope(read_only=True) as session:
+            last_keys: Sequence[Any] = ()
+            for count, row in enumerate(session.execute(stmt), start=1):
+                if count > self.page_size:
+                    # One extra row proves there is another page after the last one yielded
+                    self.next_cursor = _encode_cursor(last_keys)
+                    break
+                last_keys = tuple(row)[_VIEW_WIDTH:]
+                yield MiniatureView._make(row[:_VIEW_WIDTH])
+
+
+def get_miniatures_page(
+    search_query: str | None = None,
+    sort: str | None = None,
+    direction: str | None = None,
+    series_filter: str | None = None,
+    after: str | None = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+) -> MiniaturePage:
+    """Return the page of miniatures following the ``after`` cursor in the active sort order."""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    stmt, rank = _filtered_select(search_query, series_filter)
+    keys, descending = _sort_keys(sort, direction, rank)
+
+    if after:
+        values = _decode_cursor(after, len(keys))
+        if values is not None:
+            row_key, cursor_key = tuple_(*keys), tuple_(*values)
+            stmt = stmt.where(row_key < cursor_key if descending else row_key > cursor_key)
+
+    stmt = stmt.order_by(*(k.desc() if descending else k.asc() for k in keys))
+    return MiniaturePage(stmt, keys, page_size)
 
 
 def get_all_miniatures(
@@ -15,142 +248,491 @@ def get_all_miniatures(
     sort: str | None = None,
     direction: str | None = None,
     series_filter: str | None = None,
-) -> Sequence[Miniature]:
-    with session_scope() as session:
-        stmt = select(Miniature)
-
-        # Series filter
-        if series_filter and series_filter != "All":
-            stmt = stmt.where(Miniature.series == series_filter)
-
-        # Search query
-        if search_query:
-            like = f"%{search_query}%"
-            conditions = [
-                Miniature.prefix.like(like),
-                Miniature.chassis.like(like),
-                Miniature.type.like(like),
-                Miniature.series.like(like),
-            ]
-            # If the search query is an integer, match unique_id exactly
-            if search_query.isdigit():
-                conditions.append(Miniature.unique_id == int(search_query))
-            stmt = stmt.where(or_(*conditions))
-
-        # Sorting logic
-        valid_sort_columns = {
-            "series": Miniature.series,
-            "unique_id": Miniature.unique_id,
-            "prefix": Miniature.prefix,
-            "chassis": Miniature.chassis,
-            "type": Miniature.type,
-            "status": Miniature.status,
-            "tray_id": Miniature.tray_id,
-        }
-        if sort in valid_sort_columns:
-            col = valid_sort_columns[sort]
-            if direction == "desc":
-                stmt = stmt.order_by(col.desc())
-            elif direction == "asc":
-                stmt = stmt.order_by(col.asc())
-        else:
-            # Default sort: series ASC, then unique_id ASC
-            stmt = stmt.order_by(Miniature.series.asc(), Miniature.unique_id.asc())
+) -> list[MiniatureView]:
+    with session_scope(read_only=True) as session:
+        stmt, rank = _filtered_select(search_query, series_filter)
+        keys, descending = _sort_keys(sort, direction, rank)
+        stmt = stmt.order_by(*(k.desc() if descending else k.asc() for k in keys))
+        return [MiniatureView._make(row) for row in session.execute(stmt)]
 
-        return session.execute(stmt).scalars().all()
 
+def get_miniature(id: int) -> MiniatureView | None:  # noqa: A002
+    with session_scope(read_only=True) as session:
+        row = session.execute(select(*MINIATURE_COLUMNS).where(Miniature.id == id)).first()
+        return MiniatureView._make(row) if row else None
 
+
+@retry_on_busy
 def add_miniature(data: dict) -> Miniature:
     with session_scope() as session:
+        (before,) = read_versions(session, "miniatures")
         # Ensure series defaults to "A" if not provided
         if "series" not in data or not data["series"]:
             data["series"] = "A"
         mini = Miniature(**data)
         session.add(mini)
         session.flush()  # populate PK
-        return mini
+        (after,) = read_versions(session, "miniatures")
+
+    chassis_index.apply_change(before, after, mini.id, chassis_index.entry(mini))
+    return mini
 
 
+@retry_on_busy
 def update_miniature(id: int, data: dict) -> Miniature | None:  # noqa: A002
     with session_scope() as session:
         mini = session.get(Miniature, id)
         if not mini:
             return None
+        (before,) = read_versions(session, "miniatures")
         for k, v in data.items():
             if hasattr(mini, k):
                 setattr(mini, k, v)
         session.flush()
-        return mini
+        (after,) = read_versions(session, "miniatures")
 
+    chassis_index.apply_change(before, after, mini.id, chassis_index.entry(mini))
+    return mini
 
+
+@retry_on_busy
 def delete_miniature(id: int) -> bool:  # noqa: A002
+    """Delete a miniature along with its force assignments (foreign keys are enforced)."""
     with session_scope() as session:
         mini = session.get(Miniature, id)
         if not mini:
             return False
+        (before,) = read_versions(session, "miniatures")
+        assigned = session.execute(
+            delete(ForceMiniature).where(ForceMiniature.miniature_id == id)
+        ).rowcount
         session.delete(mini)
-        return True
+        session.flush()
+        (after,) = read_versions(session, "miniatures")
 
+    chassis_index.apply_change(before, after, id, None)
+    if assigned:
+        force_service.invalidate_active_force()
+    return True
 
-def export_to_json(path: str) -> Path:
-    minis = get_all_miniatures()
-    data = [m.to_dict() for m in minis]
+
+# Rows fetched per round trip while exporting
+EXPORT_BATCH_SIZE = 500
+# Column order for tabular exports (matches Miniature.to_dict)
+EXPORT_FIELDS = (
+    "id",
+    "series",
+    "unique_id",
+    "prefix",
+    "chassis",
+    "type",
+    "status",
+    "tray_id",
+    "notes",
+    "created_at",
+)
+
+
+def iter_export_rows() -> Iterator[dict[str, Any]]:
+    """Yield every miniature as an export dict (same shape as ``Miniature.to_dict``).
+
+    Rows come from a Core select streamed with ``yield_per``, so no ORM objects are built
+    and memory stays flat however large the inventory is.
+    """
+    table = Miniature.__table__
+    stmt = (
+        select(table)
+        .order_by(table.c.series, table.c.unique_id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    with session_scope(read_only=True) as session:
+        for row in session.execute(stmt).mappings():
+            item = dict(row)
+            created_at = item["created_at"]
+            item["created_at"] = created_at.isoformat() if created_at else None
+            yield item
+
+
+def iter_export_json(compact: bool = False) -> Iterator[str]:
+    """Yield the JSON array export piece by piece.
+
+    The default output is byte-for-byte what ``json.dumps(rows, indent=2)`` would produce;
+    ``compact`` drops all optional whitespace.
+    """
+    first = True
+    for item in iter_export_rows():
+        if compact:
+            yield ("[" if first else ",") + json.dumps(item, separators=(",", ":"))
+        else:
+            body = json.dumps(item, indent=2).replace("\n", "\n  ")
+            yield ("[\n  " if first else ",\n  ") + body
+        first = False
+
+    if first:
+        yield "[]"
+    else:
+        yield "]" if compact else "\n]"
+
+
+def iter_export_ndjson() -> Iterator[str]:
+    """Yield the export as newline-delimited JSON, one miniature object per line."""
+    for item in iter_export_rows():
+        yield json.dumps(item, separators=(",", ":")) + "\n"
+
+
+def iter_export_csv() -> Iterator[str]:
+    """Yield the export as CSV lines with a header row of the export field names."""
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+
+    def flush() -> str:
+        text_line = line.getvalue()
+        line.seek(0)
+        line.truncate()
+        return text_line
+
+    writer.writeheader()
+    yield flush()
+    for item in iter_export_rows():
+        writer.writerow(item)
+        yield flush()
+
+
+EXPORT_FORMATS = {
+    # format: (piece iterator, mimetype, file extension)
+    "json": (iter_export_json, "application/json", "json"),
+    "ndjson": (iter_export_ndjson, "application/x-ndjson", "ndjson"),
+    "csv": (iter_export_csv, "text/csv", "csv"),
+}
+
+
+def export_to_json(path: str, compact: bool = False) -> Path:
     target = Path(path)
-    target.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    with target.open("wb") as f:
+        for chunk in chunked(iter_export_json(compact=compact)):
+            f.write(chunk)
     return target
 
 
-def import_from_json(path: str, merge: bool = False) -> int:
-    file_path = Path(path)
-    raw = json.loads(file_path.read_text(encoding="utf-8"))
-    if not isinstance(raw, Iterable):  # basic sanity
-        raise ValueError("JSON must be a list of miniature objects")
+# Rows written per write transaction during imports; concurrent writers wait at most
+# one batch for the write lock
+IMPORT_BATCH_SIZE = 500
+# Per-row errors kept in an import report (every error is still counted)
+MAX_REPORTED_ERRORS = 100
 
-    imported = 0
-    with session_scope() as session:
-        if not merge:
-            # Clear existing
-            session.query(Miniature).delete()
+_REQUIRED_FIELDS = ("prefix", "chassis", "type")
+_OPTIONAL_FIELDS = ("status", "tray_id", "notes")
+
+
+class _InvalidRecord(NamedTuple):
+    """Placeholder for a record a reader could not parse, reported by the importer."""
+
+    error: str
+
+
+# Column mapping for the legacy spreadsheet layout (archive/original.csv)
+_ORIGINAL_CSV_COLUMNS = {
+    "Unit": "chassis",
+    "Series": "series",
+    "ID Number": "unique_id",
+    "Prefix": "prefix",
+}
+
+
+def iter_ndjson_records(fp: TextIO) -> Iterator[Any]:
+    """Yield one record per non-blank line of newline-delimited JSON."""
+    for line_no, line in enumerate(fp, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield _InvalidRecord(f"line {line_no} is not valid JSON ({exc.msg})")
+
+
+def iter_csv_records(fp: TextIO) -> Iterator[dict[str, Any]]:
+    """Yield records from a CSV file, one row at a time.
+
+    Files exported by MechBay use the export field names as headers. The legacy
+    spreadsheet layout (``Unit``, ``Series``, ``ID Number``, ``Prefix``...) is mapped onto
+    those fields, with every row treated as a Mech. Empty cells become missing values.
+    """
+    reader = csv.DictReader(fp)
+    fields = reader.fieldnames or []
+    legacy = "Unit" in fields and "chassis" not in fields
+
+    for row in reader:
+        if not any((value or "").strip() for value in row.values() if isinstance(value, str)):
+            continue  # spreadsheet filler rows
+        if legacy:
+            record = {
+                field: row[column].strip()
+                for column, field in _ORIGINAL_CSV_COLUMNS.items()
+                if (row.get(column) or "").strip()
+            }
+            record.setdefault("type", "Mech")
+        else:
+            record = {
+                key: value
+                for key, value in row.items()
+                if key in EXPORT_FIELDS and value is not None and value != ""
+            }
+        yield record
+
+
+_IMPORT_READERS = {
+    "json": iter_json_array,
+    "ndjson": iter_ndjson_records,
+    "csv": iter_csv_records,
+}
+_FORMAT_EXTENSIONS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+def detect_import_format(fp: TextIO, filename: str | None = None) -> str:
+    """Pick the reader for an upload from its extension, else from its first character.
+
+    ``[`` means a JSON array, ``{`` newline-delimited JSON, anything else CSV. ``fp`` must
+    be seekable; it is rewound after peeking.
+    """
+    if filename:
+        fmt = _FORMAT_EXTENSIONS.get(Path(filename).suffix.lower())
+        if fmt:
+            return fmt
+
+    head = fp.read(1024).lstrip()
+    fp.seek(0)
+    if head.startswith("["):
+        return "json"
+    if head.startswith("{"):
+        return "ndjson"
+    return "csv"
+
+
+def _import_values(item: Any) -> dict[str, Any]:
+    """Validate one imported record and return its column values.
 
-        for item in raw:
-            raw_unique_id = item.get("unique_id")
-            # Coerce to int; skip if cannot convert
+    Optional fields missing from the record are left out so a merge keeps stored values.
+    """
+    if isinstance(item, _InvalidRecord):
+        raise ValueError(item.error)
+    if not isinstance(item, dict):
+        raise ValueError("record is not an object")
+
+    values = {"series": _text_value(item, "series") or "A", "unique_id": _unique_id(item)}
+    for field in _REQUIRED_FIELDS:
+        if item.get(field) is None:
+            raise ValueError(f"{field} is missing")
+        values[field] = _text_value(item, field)
+    for field in _OPTIONAL_FIELDS:
+        if field in item:
+            values[field] = _text_value(item, field)
+    return values
+
+
+def _unique_id(item: dict[str, Any]) -> int:
+    """The record's ``unique_id`` as an int SQLite can store; bools and fractions are rejected."""
+    raw = item.get("unique_id")
+    if isinstance(raw, bool) or (isinstance(raw, float) and not raw.is_integer()):
+        raise ValueError(f"unique_id {raw!r} is not an integer")
+    try:
+        value = int(raw)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"unique_id {raw!r} is not an integer") from None
+    if value not in _SQLITE_INTEGER_RANGE:
+        raise ValueError(f"unique_id {raw!r} is out of range")
+    return value
+
+
+def _text_value(item: dict[str, Any], field: str) -> str | None:
+    """A text column's value, which must be a string or null."""
+    value = item.get(field)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{field} {value!r} is not a string")
+    return value
+
+
+def _upsert_batch(connection: Connection, rows: list[dict[str, Any]]) -> None:
+    """Write ``rows`` with INSERT ... ON CONFLICT(series, unique_id) DO UPDATE."""
+    table = Miniature.__table__
+
+    # Rows carrying the same fields share one statement, so fields a record leaves out
+    # are never overwritten on existing miniatures
+    by_fields: dict[frozenset[str], list[dict[str, Any]]] = {}
+    for row in rows:
+        by_fields.setdefault(frozenset(row), []).append(row)
+
+    for fields, group in by_fields.items():
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.series, table.c.unique_id],
+            set_={f: stmt.excluded[f] for f in fields if f not in ("series", "unique_id")},
+        )
+        connection.execute(stmt, group)
+
+
+# Validated records wait here (one JSON object per row, in file order) until the whole
+# file has been read. Temporary tables live outside the main database, so filling this
+# one takes no lock other writers would wait for.
+_STAGING_DDL = (
+    (
+        "CREATE TEMP TABLE IF NOT EXISTS import_rows"
+        " (seq INTEGER PRIMARY KEY, series VARCHAR(16), unique_id INTEGER, row_values TEXT)"
+    ),
+    "CREATE INDEX IF NOT EXISTS temp.ix_import_rows_key ON import_rows (series, unique_id)",
+    "DELETE FROM temp.import_rows",
+)
+_STAGE_ROW = text(
+    "INSERT INTO temp.import_rows (series, unique_id, row_values)"
+    " VALUES (:series, :unique_id, :row_values)"
+)
+_STAGED_BATCH = text(
+    "SELECT row_values FROM temp.import_rows WHERE seq > :after ORDER BY seq LIMIT :limit"
+)
+_UNLISTED_BATCH = text(
+    "SELECT id FROM miniatures m WHERE NOT EXISTS (SELECT 1 FROM temp.import_rows k"
+    " WHERE k.series = m.series AND k.unique_id = m.unique_id) LIMIT :limit"
+)
+
+
+def _stage_records(
+    connection: Connection,
+    records: Iterable[Any],
+    report: dict[str, Any],
+    progress: Callable[[int], None] | None,
+) -> int:
+    """Validate ``records`` into the staging table, returning how many were staged."""
+    staged = 0
+    batch: list[dict[str, Any]] = []
+    with connection.begin():
+        for statement in _STAGING_DDL:
+            connection.exec_driver_sql(statement)
+        for record_no, item in enumerate(records, start=1):
             try:
-                unique_id = int(raw_unique_id) if raw_unique_id is not None else None
-            except (TypeError, ValueError):
-                continue  # skip invalid record
-
-            # Default series to "A" if not in import data
-            series = item.get("series", "A")
-            if not series:
-                series = "A"
-
-            if merge and unique_id is not None:
-                # Match on BOTH series and unique_id for merge
-                existing = (
-                    session.query(Miniature)
-                    .filter(and_(Miniature.series == series, Miniature.unique_id == unique_id))
-                    .first()
-                )
-                if existing:
-                    for k, v in item.items():
-                        if hasattr(existing, k):
-                            # Ensure we don't accidentally write string unique_id back
-                            if k == "unique_id":
-                                continue
-                            setattr(existing, k, v)
-                    continue
-            mini = Miniature(
-                series=series,
-                unique_id=unique_id,
-                prefix=item.get("prefix"),
-                chassis=item.get("chassis"),
-                type=item.get("type"),
-                status=item.get("status"),
-                tray_id=item.get("tray_id"),
-                notes=item.get("notes"),
+                values = _import_values(item)
+            except ValueError as exc:
+                report["error_count"] += 1
+                if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                    report["errors"].append({"record": record_no, "error": str(exc)})
+                continue
+            batch.append(
+                {
+                    "series": values["series"],
+                    "unique_id": values["unique_id"],
+                    "row_values": json.dumps(values),
+                }
             )
-            session.add(mini)
-            imported += 1
-        session.flush()
-    return imported
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                connection.execute(_STAGE_ROW, batch)
+                staged += len(batch)
+                batch = []
+                if progress:
+                    progress(record_no)
+        if batch:
+            connection.execute(_STAGE_ROW, batch)
+            staged += len(batch)
+    return staged
+
+
+@retry_on_busy
+def _apply_staged_batch(connection: Connection, after: int) -> int:
+    """Upsert the staged rows following position ``after`` in one write transaction."""
+    with connection.begin():
+        rows = [
+            json.loads(row_values)
+            for row_values in connection.execute(
+                _STAGED_BATCH, {"after": after, "limit": IMPORT_BATCH_SIZE}
+            ).scalars()
+        ]
+        if rows:
+            _upsert_batch(connection, rows)
+    return len(rows)
+
+
+@retry_on_busy
+def _delete_unlisted_batch(connection: Connection) -> int:
+    """Delete up to one batch of miniatures missing from the staged rows."""
+    with connection.begin():
+        ids = list(connection.execute(_UNLISTED_BATCH, {"limit": IMPORT_BATCH_SIZE}).scalars())
+        if ids:
+            connection.execute(delete(ForceMiniature).where(ForceMiniature.miniature_id.in_(ids)))
+            connection.execute(delete(Miniature).where(Miniature.id.in_(ids)))
+    return len(ids)
+
+
+def import_miniatures(
+    records: Iterable[Any],
+    merge: bool = False,
+    progress: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Upsert miniature records in batches, matching on (series, unique_id).
+
+    Without ``merge`` the import replaces the inventory: matching miniatures keep their ids
+    (and force assignments) while miniatures absent from the records are deleted. Invalid
+    records are skipped and reported by their 1-based position. ``progress`` is called
+    with the number of records read after each batch.
+
+    Every record is read and validated into a temporary staging table before anything
+    is written, so a file that cannot be parsed leaves the inventory untouched. The
+    staged rows are then applied in write transactions of ``IMPORT_BATCH_SIZE`` rows,
+    releasing the write lock between them, so a concurrent edit waits for one batch
+    rather than the whole import. Each batch is retried on its own if the database is
+    busy.
+    """
+    report: dict[str, Any] = {"imported": 0, "error_count": 0, "errors": []}
+
+    with extensions.engine.connect() as connection:
+        try:
+            report["imported"] = _stage_records(connection, records, report, progress)
+
+            # Sequence numbers of staged rows run from 1 with no gaps
+            connection.execution_options(sqlite_begin="IMMEDIATE")
+            applied = 0
+            while applied < report["imported"]:
+                applied += _apply_staged_batch(connection, applied)
+            if not merge:
+                while _delete_unlisted_batch(connection):
+                    pass
+        finally:
+            connection.exec_driver_sql("DROP TABLE IF EXISTS temp.import_rows")
+            connection.commit()
+
+    if not merge:
+        # Removed miniatures may have been assigned to the active force
+        force_service.invalidate_active_force()
+    return report
+
+
+def import_from_stream(
+    stream: IO[bytes],
+    merge: bool = False,
+    fmt: str | None = None,
+    filename: str | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Import a JSON array, NDJSON or CSV upload, parsing it straight from a binary stream.
+
+    The format is detected from ``filename`` (or the stream's contents) unless ``fmt`` is
+    given; detection needs a seekable stream.
+    """
+    with text_stream(stream) as f:
+        fmt = fmt or detect_import_format(f, filename)
+        if fmt not in _IMPORT_READERS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+        return import_miniatures(_IMPORT_READERS[fmt](f), merge=merge, progress=progress)
+
+
+def import_from_file(
+    path: str,
+    merge: bool = False,
+    fmt: str | None = None,
+    filename: str | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> dict[str, Any]:
+    """Import a JSON array, NDJSON or CSV file, streaming its records."""
+    with Path(path).open("rb") as f:
+        return import_from_stream(f, merge=merge, fmt=fmt, filename=filename, progress=progress)
+
+
+def import_from_json(path: str, merge: bool = False) -> dict[str, Any]:
+    """Import a JSON array of miniature objects, parsing it incrementally."""
+    return import_from_file(path, merge=merge, fmt="json")
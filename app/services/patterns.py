@@ -0,0 +1,125 @@
+"""The chassis-pattern language used by lance template slots.
+
+=============================  ==================================================
+``Warhammer``                  chassis contains the text (the original behaviour)
+``=Atlas``                     chassis is exactly the text
+``prefix:WHM``                 miniature prefix code is exactly the text
+``Shadow*``, ``Mad Cat ?``     glob over the whole chassis (``*``, ``?``, ``[...]``)
+``/(Black|Night)hawk( II)?/``  regular expression over the whole chassis
+``Archer|Catapult``            any of the alternatives, each in any form above
+=============================  ==================================================
+
+Matching ignores case and repeated whitespace. A pattern is compiled once into a
+matcher (cached by its text) and evaluated against the in-memory chassis index: a
+matcher returns the index *variants* - distinct (chassis, prefix) pairs - it accepts, so
+its cost depends on the number of distinct chassis, not on the number of miniatures.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple
+
+if TYPE_CHECKING:
+    from .chassis_index import ChassisIndex, Variant
+
+# Compiled patterns kept by their text
+PATTERN_CACHE_SIZE = 1024
+
+_GLOB_CHARS = frozenset("*?[")
+
+
+def normalize(text: str) -> str:
+    """Case-insensitive, whitespace-insensitive form used for both names and patterns."""
+    return " ".join(text.casefold().split())
+
+
+class Substring(NamedTuple):
+    text: str
+
+    def variants(self, index: ChassisIndex) -> set[Variant]:
+        return index.variants_for_names(index.names_containing(self.text))
+
+
+class Exact(NamedTuple):
+    name: str
+
+    def variants(self, index: ChassisIndex) -> set[Variant]:
+        return index.variants_for_names([self.name])
+
+
+class Prefix(NamedTuple):
+    code: str
+
+    def variants(self, index: ChassisIndex) -> set[Variant]:
+        return index.variants_with_prefix(self.code)
+
+
+class NameRegex(NamedTuple):
+    regex: re.Pattern[str]
+
+    def variants(self, index: ChassisIndex) -> set[Variant]:
+        return index.variants_for_names(n for n in index.names() if self.regex.fullmatch(n))
+
+
+class AnyOf(NamedTuple):
+    alternatives: tuple[Matcher, ...]
+
+    def variants(self, index: ChassisIndex) -> set[Variant]:
+        return set().union(*(alternative.variants(index) for alternative in self.alternatives))
+
+
+class Nothing(NamedTuple):
+    """Stands in for a pattern that does not compile, so a bad slot just stays empty."""
+
+    error: str
+
+    def variants(self, index: ChassisIndex) -> set[Variant]:  # noqa: ARG002
+        return set()
+
+
+Matcher = Substring | Exact | Prefix | NameRegex | AnyOf | Nothing
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern: str) -> Matcher:
+    """Compile ``pattern`` into a matcher, raising ``ValueError`` if it is malformed."""
+    text = pattern.strip()
+    if len(text) >= 2 and text.startswith("/") and text.endswith("/"):
+        try:
+            return NameRegex(re.compile(text[1:-1], re.IGNORECASE))
+        except re.error as exc:
+            raise ValueError(f"Invalid regular expression {text}: {exc}") from exc
+    if "|" in text:
+        alternatives = [part for part in text.split("|") if part.strip()]
+        if not alternatives:
+            raise ValueError(f"Empty alternation: {text!r}")
+        return AnyOf(tuple(compile_pattern(part) for part in alternatives))
+    if text.startswith("="):
+        return Exact(normalize(text[1:]))
+    if text[:7].casefold() == "prefix:":
+        return Prefix(normalize(text[7:]))
+    if _GLOB_CHARS & set(text):
+        return NameRegex(re.compile(fnmatch.translate(normalize(text))))
+    if not text:
+        raise ValueError("Empty chassis pattern")
+    return Substring(normalize(text))
+
+
+def pattern_error(pattern: str) -> str | None:
+    """Why ``pattern`` is not a valid chassis pattern, or None if it is."""
+    try:
+        compile_pattern(pattern)
+    except ValueError as exc:
+        return str(exc)
+    return None
+
+
+def matcher_for(pattern: str) -> Matcher:
+    """``compile_pattern`` for matching: a malformed pattern matches nothing."""
+    try:
+        return compile_pattern(pattern)
+    except ValueError as exc:
+        return Nothing(str(exc))
@@ -0,0 +1,90 @@
+"""Immutable read models for pages, reports and exports.
+
+Read paths build these from column-only selects instead of loading ORM instances, which
+skips identity-map bookkeeping and attribute instrumentation for rows that are only
+displayed. Attribute names match the models so templates work with either. ORM models
+remain the way to write.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import NamedTuple
+
+from ..models.force import Force
+from ..models.force_miniature import ForceMiniature
+from ..models.lance import Lance
+from ..models.lance_template import LanceTemplate
+from ..models.lance_template_miniature import LanceTemplateMiniature
+from ..models.miniature import Miniature
+
+
+class MiniatureView(NamedTuple):
+    id: int
+    series: str
+    unique_id: int
+    prefix: str
+    chassis: str
+    type: str
+    status: str | None
+    tray_id: str | None
+    notes: str | None
+    created_at: datetime | None
+
+
+class AssignmentView(NamedTuple):
+    """A miniature's place in a lance (the read side of ``ForceMiniature``)."""
+
+    order: int
+    miniature: MiniatureView
+
+
+class LanceView(NamedTuple):
+    id: int
+    name: str | None
+    order: int
+    miniatures: tuple[AssignmentView, ...]
+
+
+class ForceSummary(NamedTuple):
+    id: int
+    name: str
+    is_active: bool
+    created_at: datetime | None
+
+
+class ForceView(NamedTuple):
+    id: int
+    name: str
+    is_active: bool
+    created_at: datetime | None
+    lances: tuple[LanceView, ...]
+
+
+class PatternView(NamedTuple):
+    chassis_pattern: str
+    order: int
+
+
+class TemplateView(NamedTuple):
+    id: int
+    name: str
+    description: str | None
+    miniatures: tuple[PatternView, ...]
+
+
+def columns(view: type[NamedTuple], model: type) -> tuple:
+    """The model columns matching ``view``'s fields, in field order, for a Core select."""
+    return tuple(getattr(model, field) for field in view._fields)
+
+
+MINIATURE_COLUMNS = columns(MiniatureView, Miniature)
+FORCE_SUMMARY_COLUMNS = columns(ForceSummary, Force)
+LANCE_COLUMNS = (Lance.id, Lance.name, Lance.order)
+ASSIGNMENT_COLUMNS = (ForceMiniature.lance_id, ForceMiniature.order, *MINIATURE_COLUMNS)
+TEMPLATE_COLUMNS = (LanceTemplate.id, LanceTemplate.name, LanceTemplate.description)
+PATTERN_COLUMNS = (
+    LanceTemplateMiniature.template_id,
+    LanceTemplateMiniature.chassis_pattern,
+    LanceTemplateMiniature.order,
+)
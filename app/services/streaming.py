@@ -0,0 +1,116 @@
+"""Helpers for producing large responses and files incrementally."""
+
+from __future__ import annotations
+
+import io
+import json
+import zlib
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import IO, Any, TextIO
+
+# Target size of the pieces handed to the WSGI server
+CHUNK_SIZE = 64 * 1024
+
+
+def chunked(pieces: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Join small text pieces into UTF-8 chunks of roughly ``size`` bytes."""
+    buffer: list[str] = []
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= size:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Gzip a byte stream incrementally, without holding the whole payload."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_json_array(fp: TextIO, read_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array while reading ``fp`` in blocks.
+
+    Only one block (plus the item being decoded) is held in memory at a time. Raises
+    ``ValueError`` if the document is not a well-formed JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def more() -> bool:
+        nonlocal buffer, pos, eof
+        block = fp.read(read_size)
+        if not block:
+            eof = True
+            return False
+        buffer = buffer[pos:] + block
+        pos = 0
+        return True
+
+    def next_char() -> str:
+        """Skip whitespace and return the next significant character ('' at EOF)."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not more():
+                return ""
+
+    if next_char() != "[":
+        raise ValueError("JSON must be a list of objects")
+    pos += 1
+    if next_char() == "]":
+        pos += 1
+    else:
+        while True:
+            next_char()
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as exc:
+                    if eof or not more():
+                        raise ValueError(f"Invalid JSON: {exc}") from exc
+                    continue
+                # A value ending exactly at the buffer edge may be a truncated number
+                if end == len(buffer) and not eof and more():
+                    continue
+                break
+            pos = end
+            yield item
+
+            separator = next_char()
+            pos += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError("Invalid JSON: expected ',' or ']' between list items")
+
+    if next_char():
+        raise ValueError("Invalid JSON: unexpected data after the list")
+
+
+@contextmanager
+def text_stream(stream: IO[bytes]) -> Iterator[TextIO]:
+    """Decode a binary upload stream as UTF-8 text (BOM tolerated) without copying it.
+
+    The wrapper is detached on exit, so ``stream`` stays open for its owner to close.
+    """
+    wrapper = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        yield wrapper
+    finally:
+        wrapper.detach()
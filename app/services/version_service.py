@@ -0,0 +1,33 @@
+"""Per-entity data versions for cheap change detection.
+
+SQLite triggers (migration 3) bump a counter in ``data_versions`` whenever a row of an
+entity's tables is inserted, updated or deleted, in the same transaction as the change.
+Comparing versions tells a caller whether anything changed without loading any rows.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import column, select, table
+from sqlalchemy.orm import Session
+
+from ..extensions import session_scope
+
+_data_versions = table("data_versions", column("entity"), column("version"))
+
+
+def get_versions(*entities: str) -> tuple[int, ...]:
+    """Return the current version of each entity, in the order given."""
+    with session_scope(read_only=True) as session:
+        return read_versions(session, *entities)
+
+
+def read_versions(session: Session, *entities: str) -> tuple[int, ...]:
+    """Like ``get_versions`` but inside ``session``'s transaction, e.g. around a write."""
+    rows = dict(
+        session.execute(
+            select(_data_versions.c.entity, _data_versions.c.version).where(
+                _data_versions.c.entity.in_(entities)
+            )
+        ).all()
+    )
+    return tuple(rows.get(entity, 0) for entity in entities)
@@ -0,0 +1,55 @@
+"""Upload handling: size limit and where multipart file parts are buffered."""
+
+from __future__ import annotations
+
+from tempfile import SpooledTemporaryFile
+from typing import IO
+
+from flask import Flask, current_app, flash, jsonify, redirect, request
+from flask.wrappers import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+class UploadRequest(Request):
+    """Request that keeps small uploads in memory and spools larger ones to disk.
+
+    Each upload gets its own anonymous temporary file once it grows past
+    ``UPLOAD_SPOOL_THRESHOLD`` bytes, so concurrent uploads never share a path and the
+    importers can parse ``request.files[...].stream`` directly.
+    """
+
+    def _get_file_stream(
+        self,
+        total_content_length: int | None,
+        content_type: str | None,
+        filename: str | None = None,
+        content_length: int | None = None,
+    ) -> IO[bytes]:
+        threshold = current_app.config["UPLOAD_SPOOL_THRESHOLD"]
+        return SpooledTemporaryFile(max_size=threshold, mode="rb+")
+
+
+def _is_browser_form_post() -> bool:
+    """Whether the request is a page navigation (an HTML form), not a script call.
+
+    Browsers name ``text/html`` explicitly when navigating; ``fetch`` sends ``*/*``,
+    which must not count, or its caller would follow a redirect to a POST-only URL.
+    """
+    explicit_html = any(
+        mimetype in ("text/html", "application/xhtml+xml")
+        for mimetype, _ in request.accept_mimetypes
+    )
+    return explicit_html and not request.is_json
+
+
+def init_uploads(app: Flask) -> None:
+    app.request_class = UploadRequest
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def upload_too_large(exc: RequestEntityTooLarge):
+        limit_mb = app.config["MAX_CONTENT_LENGTH"] / (1024 * 1024)
+        message = f"Upload too large (limit {limit_mb:g} MB)"
+        if not _is_browser_form_post():
+            return jsonify({"success": False, "error": message}), 413
+        flash(message, "danger")
+        return redirect(request.url)
@@ -14,18 +14,19 @@ from app import create_app  # noqa: E402
 
 
 @pytest.fixture(scope="function")
-def app():
+def app(tmp_path):
     """Provide a fresh Flask app backed by an in-memory SQLite database per test.
 
     Using an in-memory database ensures tests never touch or clear production data.
     The schema is created at app init and discarded automatically when the engine
-    is disposed at test end.
+    is disposed at test end. Background job files go to a per-test temporary folder.
     """
     test_app = create_app(
         {
             "TESTING": True,
             # pysqlite driver explicit for consistency; plain sqlite:///:memory: also works
             "DATABASE_URL": "sqlite+pysqlite:///:memory:",
+            "JOB_DIR": str(tmp_path / "jobs"),
         }
     )
     return test_app
@@ -48,3 +49,20 @@ def mini_data():
         "tray_id": "T1",
         "notes": "First test mini",
     }
+
+
+@pytest.fixture()
+def query_log(app):
+    """Collect the SQL statements executed against the app's engine during a test."""
+    from sqlalchemy import event
+
+    from app import extensions
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):  # noqa: ARG001
+        statements.append(statement)
+
+    event.listen(extensions.engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(extensions.engine, "before_cursor_execute", record)
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import pytest
+
+from app.services import force_service
+from app.services.miniature_service import add_miniature
+
+
+def _build_force(mini_data, lances: int, per_lance: int) -> int:
+    force = force_service.create_force(f"Force {lances}x{per_lance}")
+    uid = 1
+    for _ in range(lances):
+        lance = force_service.create_empty_lance(force.id)
+        for _ in range(per_lance):
+            mini = add_miniature(mini_data | {"unique_id": uid, "chassis": f"Mech {uid}"})
+            force_service.add_miniature_to_lance(mini.id, lance.id)
+            uid += 1
+    return force.id
+
+
+def _walk(force) -> list[str]:
+    return [fm.miniature.chassis for lance in force.lances for fm in lance.miniatures]
+
+
+@pytest.mark.parametrize(("lances", "per_lance"), [(1, 1), (3, 4), (8, 6)])
+def test_force_tree_loads_in_fixed_queries(app, mini_data, query_log, lances, per_lance):
+    force_id = _build_force(mini_data, lances, per_lance)
+
+    query_log.clear()
+    force = force_service.get_force_by_id(force_id)
+    assert len(_walk(force)) == lances * per_lance
+    assert len([s for s in query_log if s.lstrip().upper().startswith("SELECT")]) <= 3
+
+    query_log.clear()
+    active = force_service.get_active_force()
+    assert len(_walk(active)) == lances * per_lance
+    assert len([s for s in query_log if s.lstrip().upper().startswith("SELECT")]) <= 3
+
+
+def test_miniatures_page_uses_cached_active_force(client, mini_data, query_log):
+    force_id = _build_force(mini_data, lances=2, per_lance=1)
+    spare = add_miniature(mini_data | {"unique_id": 99, "chassis": "Spare"})
+
+    client.get("/miniatures")  # warm the snapshot
+    query_log.clear()
+    body = client.get("/miniatures").get_data(as_text=True)
+    assert "Force 2x1" in body
+    assert not [s for s in query_log if "forces" in s or "lances" in s]
+
+    # A mutation invalidates the snapshot so the new assignment shows up
+    lance_id = force_service.get_force_by_id(force_id).lances[0].id
+    assert force_service.add_miniature_to_lance(spare.id, lance_id)["success"]
+    snapshot = force_service.get_active_force_snapshot()
+    assert spare.id in snapshot.assigned_miniature_ids
+    assert [lance.id for lance in snapshot.lances][0] == lance_id
+
+
+def test_read_paths_return_read_models(client, mini_data):
+    from app.services import lance_template_service
+    from app.services.read_models import ForceSummary, ForceView, TemplateView
+
+    force_id = _build_force(mini_data, lances=2, per_lance=2)
+    lance_template_service.create_template("Striker", ["Mech 1", "Mech 3"], "Fast hitters")
+
+    force = force_service.get_force_by_id(force_id)
+    assert isinstance(force, ForceView)
+    assert _walk(force) == ["Mech 1", "Mech 2", "Mech 3", "Mech 4"]
+    assert all(isinstance(f, ForceSummary) for f in force_service.get_all_forces())
+    [template] = lance_template_service.get_all_templates()
+    assert isinstance(template, TemplateView)
+    assert [p.chassis_pattern for p in template.miniatures] == ["Mech 1", "Mech 3"]
+
+    # Templates render the read models exactly as they rendered ORM objects
+    assert "Force 2x2" in client.get("/forces").get_data(as_text=True)
+    detail = client.get(f"/forces/{force_id}").get_data(as_text=True)
+    assert "2 Lance(s), 4 Miniature(s)" in detail and "Striker" in detail
+    assert "Mech 4" in client.get(f"/forces/{force_id}/report").get_data(as_text=True)
+    assert "Mech 3" in client.get(f"/lance-templates/{template.id}").get_data(as_text=True)
+    assert "Fast hitters" in client.get("/lance-templates").get_data(as_text=True)
+
+
+def test_switching_forces_touches_only_the_active_row(app, query_log):
+    from sqlalchemy import exc
+
+    from app import extensions
+
+    forces = [force_service.create_force(f"Force {n}") for n in range(20)]
+    query_log.clear()
+    assert force_service.switch_force(forces[3].id)
+
+    [deactivate] = [s for s in query_log if "WHERE forces.is_active" in s]
+    with extensions.engine.connect() as conn:
+        plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {deactivate}", (0, None, forces[3].id))
+        assert "ux_forces_single_active" in " ".join(row.detail for row in plan)
+        active = conn.exec_driver_sql("SELECT id FROM forces WHERE is_active = 1").scalars()
+        assert list(active) == [forces[3].id]
+
+        # The index rejects a second active force however it is written
+        with pytest.raises(exc.IntegrityError):
+            conn.exec_driver_sql("UPDATE forces SET is_active = 1 WHERE id = ?", (forces[0].id,))
+
+
+def test_force_membership_is_a_constraint(app, mini_data, query_log):
+    from sqlalchemy import exc
+
+    from app import extensions
+
+    force = force_service.create_force("Alpha")
+    first = force_service.create_empty_lance(force.id, "First")
+    second = force_service.create_empty_lance(force.id, "Second")
+    mini = add_miniature(mini_data)
+    assert force_service.add_miniature_to_lance(mini.id, first.id)["success"]
+
+    query_log.clear()
+    result = force_service.add_miniature_to_lance(mini.id, second.id)
+    assert result == {"success": False, "error": "Miniature already in force (Lance: First)"}
+    # No check-then-insert: the insert itself detects the duplicate
+    assert "ON CONFLICT" in next(s for s in query_log if s.startswith("INSERT"))
+
+    with extensions.engine.connect() as conn, pytest.raises(exc.IntegrityError):
+        conn.exec_driver_sql(
+            'INSERT INTO force_miniatures (force_id, lance_id, miniature_id, "order")'
+            " VALUES (?, ?, ?, 1)",
+            (force.id, second.id, mini.id),
+        )
+
+    # Moves and removals are single statements keyed on (force_id, miniature_id)
+    query_log.clear()
+    assert force_service.move_miniature_between_lances(mini.id, second.id, 1)["success"]
+    assert [s for s in query_log if s.startswith("UPDATE force_miniatures")]
+    assert not [s for s in query_log if "JOIN" in s]
+    assert force_service.get_force_by_id(force.id).lances[1].miniatures[0].miniature.id == mini.id
+
+    query_log.clear()
+    assert force_service.remove_miniature_from_force(mini.id, force.id)
+    assert not [s for s in query_log if "JOIN" in s]
+    assert force_service.get_miniatures_in_force(force.id) == set()
+
+
+def test_lance_from_template_is_one_write_transaction(client, mini_data, query_log):
+    from app.services import lance_template_service
+
+    force = force_service.create_force("Alpha")
+    for uid, chassis in enumerate(["Atlas", "Archer", "Awesome", "Axman"], start=1):
+        add_miniature(mini_data | {"unique_id": uid, "chassis": chassis})
+    template = lance_template_service.create_template("Assault", ["Atlas", "Ar", "Aw", "Ax"])
+
+    query_log.clear()
+    resp = client.post(
+        f"/forces/{force.id}/lances/from-template", data={"template_id": template.id}
+    )
+    assert resp.get_json()["success"]
+
+    writes = [s for s in query_log if s.startswith(("INSERT", "BEGIN IMMEDIATE"))]
+    assert writes[0] == "BEGIN IMMEDIATE" and writes.count("BEGIN IMMEDIATE") == 1
+    assert len([s for s in writes if s.startswith("INSERT INTO force_miniatures")]) == 1
+    [lance] = force_service.get_force_by_id(force.id).lances
+    assert [a.miniature.chassis for a in lance.miniatures] == [
+        "Atlas",
+        "Archer",
+        "Awesome",
+        "Axman",
+    ]
+
+    # Positions count from 1, as when miniatures are added one at a time
+    assert [a.order for a in lance.miniatures] == [1, 2, 3, 4]
+
+    # Miniatures already in the force are skipped, not duplicated
+    second = force_service.create_lance_with_miniatures(force.id, "Again", [1, 2])
+    assert second["added"] == [] and second["skipped"] == [1, 2]
+
+    # So are miniatures deleted after they were matched
+    fifth = add_miniature(mini_data | {"unique_id": 5})
+    third = force_service.create_lance_with_miniatures(force.id, "Late", [404, fifth.id])
+    assert third["added"] == [fifth.id] and third["skipped"] == [404]
+    sixth = add_miniature(mini_data | {"unique_id": 6})
+    force_service.add_miniature_to_lance(sixth.id, third["lance_id"])
+    late = next(lc for lc in force_service.get_force_by_id(force.id).lances if lc.name == "Late")
+    assert [(a.miniature.id, a.order) for a in late.miniatures] == [(fifth.id, 1), (sixth.id, 2)]
+
+
+def test_force_built_from_templates_matches_all_lances_at_once(client, mini_data, query_log):
+    from app.services import lance_template_service
+
+    chassis = ["Shadow Hawk", "Night Hawk", "Atlas", "Atlas"]
+    for uid, name in enumerate(chassis, start=1):
+        add_miniature(mini_data | {"unique_id": uid, "chassis": name})
+    birds = lance_template_service.create_template("Birds", ["Hawk"])
+    hawks = lance_template_service.create_template("Hawks", ["Shadow Hawk", "Atlas"])
+
+    # Lance by lance, "Hawk" takes the Shadow Hawk the second lance needed
+    first = lance_template_service.match_template_miniatures(birds.id)
+    assert first["matched"][0][2].chassis == "Shadow Hawk"
+
+    query_log.clear()
+    resp = client.post(
+        "/forces/build",
+        data={"name": "Company", "template_ids": [birds.id, hawks.id, hawks.id]},
+    )
+    assert resp.status_code == 302
+
+    writes = [s for s in query_log if s.startswith(("INSERT", "BEGIN IMMEDIATE"))]
+    assert writes.count("BEGIN IMMEDIATE") == 1
+    assert len([s for s in writes if s.startswith("INSERT INTO force_miniatures")]) == 1
+
+    force = force_service.get_active_force()
+    assert force.name == "Company"
+    assert [
+        (lance.name, [a.miniature.chassis for a in lance.miniatures]) for lance in force.lances
+    ] == [
+        ("Birds", ["Night Hawk"]),
+        ("Hawks", ["Shadow Hawk", "Atlas"]),
+        ("Hawks 2", ["Atlas"]),
+    ]
+    page = client.get(resp.headers["Location"]).get_data(as_text=True)
+    assert "Missing: Shadow Hawk" in page
+
+    assert (
+        client.post("/forces/build", data={"name": "X", "template_ids": [999]}).status_code == 302
+    )
+    assert force_service.get_active_force().name == "Company"
+
+
+def test_names_reach_inline_handlers_only_through_escaped_attributes(client):
+    from app.services import lance_template_service
+
+    name = """O'Brien"); alert("x"""
+    force = force_service.create_force(name)
+    lance_template_service.create_template(name, ["Atlas"])
+
+    escaped = "O&#39;Brien&#34;); alert(&#34;x"
+    for url in ("/forces", f"/forces/{force.id}"):
+        html = client.get(url).get_data(as_text=True)
+        assert "this.dataset." in html
+        assert f'data-force-name="{escaped}"' in html or f'data-template-name="{escaped}"' in html
+        assert name not in html
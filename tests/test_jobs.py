@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import io
+import json
+import time
+from pathlib import Path
+
+from app import create_app
+
+JSON_ACCEPT = {"Accept": "application/json"}
+
+
+def _upload(records, name="minis.json"):
+    return (io.BytesIO(json.dumps(records).encode("utf-8")), name)
+
+
+def test_background_import_reports_status(client, mini_data):
+    resp = client.post(
+        "/jobs/miniatures.import",
+        data={"file": _upload([mini_data, mini_data | {"unique_id": 1002}]), "merge": "on"},
+        headers=JSON_ACCEPT,
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert resp.headers["Location"].endswith(f"/jobs/{job['id']}/status")
+
+    # In-memory test databases run jobs inline, so the job is already finished
+    status = client.get(job["status_url"]).get_json()
+    assert status["status"] == "succeeded"
+    assert status["message"].startswith("Imported 2 miniatures")
+    assert "1002" in client.get("/miniatures").get_data(as_text=True)
+
+
+def test_background_export_download(client, mini_data):
+    client.post("/miniatures/add", data=mini_data)
+
+    resp = client.post("/jobs/miniatures.export", data={"format": "csv"})
+    assert resp.status_code == 302
+    page = client.get(resp.headers["Location"])
+    assert "Download miniatures.csv" in page.get_data(as_text=True)
+
+    job_id = resp.headers["Location"].rsplit("/", 1)[-1]
+    download = client.get(f"/jobs/{job_id}/download")
+    assert download.mimetype == "text/csv"
+    assert "Warhammer" in download.get_data(as_text=True)
+
+
+def test_failed_and_invalid_jobs(client):
+    assert client.post("/jobs/nope", headers=JSON_ACCEPT).status_code == 404
+    assert client.post("/jobs/miniatures.import", headers=JSON_ACCEPT).status_code == 400
+
+    resp = client.post(
+        "/jobs/miniatures.import",
+        data={"file": (io.BytesIO(b"[{"), "broken.json")},
+        headers=JSON_ACCEPT,
+        content_type="multipart/form-data",
+    )
+    status = client.get(resp.get_json()["status_url"]).get_json()
+    assert status["status"] == "failed"
+    assert "Invalid JSON" in status["message"]
+    assert client.get(f"/jobs/{status['id']}/download").status_code == 404
+
+
+def test_jobs_run_on_worker_thread_with_file_database(tmp_path, mini_data):
+    app = create_app(
+        {
+            "TESTING": True,
+            "DATABASE_URL": f"sqlite:///{(tmp_path / 'jobs.db').as_posix()}",
+            "JOB_DIR": str(tmp_path / "jobs"),
+        }
+    )
+    client = app.test_client()
+    resp = client.post(
+        "/jobs/miniatures.import",
+        data={"file": _upload([mini_data])},
+        headers=JSON_ACCEPT,
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 202
+    status_url = resp.get_json()["status_url"]
+
+    deadline = time.monotonic() + 10
+    status = client.get(status_url).get_json()
+    while status["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = client.get(status_url).get_json()
+    assert status["status"] == "succeeded", status
+    assert status["message"] == "Imported 1 miniatures"
+
+
+def test_only_jobs_of_dead_workers_are_failed_and_old_jobs_are_purged(app):
+    from datetime import UTC, datetime, timedelta
+
+    from app.extensions import session_scope
+    from app.models.job import Job
+    from app.services import job_service
+
+    now = datetime.now(UTC).replace(tzinfo=None)
+    old = now - timedelta(days=30)
+    result = Path(app.config["JOB_DIR"]) / "old.result"
+    result.write_text("done")
+    with session_scope() as session:
+        session.add_all(
+            [
+                # Another live worker, heartbeating
+                Job(id="live", kind="k", status="running", worker_id="w2", heartbeat_at=now),
+                # A worker that stopped heartbeating long ago
+                Job(id="dead", kind="k", status="running", worker_id="w3", heartbeat_at=old),
+                # One of ours that is no longer heartbeated, e.g. its final write failed
+                Job(
+                    id="stuck",
+                    kind="k",
+                    status="running",
+                    worker_id=job_service.worker_id(),
+                    heartbeat_at=old,
+                ),
+                Job(
+                    id="old",
+                    kind="k",
+                    status="succeeded",
+                    result_path=str(result),
+                    updated_at=old,
+                ),
+                Job(id="recent", kind="k", status="succeeded"),
+            ]
+        )
+
+    assert job_service.fail_orphaned_jobs() == 2
+    assert job_service.purge_expired_jobs() == 1
+    assert job_service.get_job("live").status == "running"
+    assert job_service.get_job("dead").status == "failed"
+    assert job_service.get_job("stuck").status == "failed"
+    assert job_service.get_job("old") is None and not result.exists()
+    assert job_service.get_job("recent") is not None
+
+
+def test_exports_of_the_same_force_do_not_share_files(app, client):
+    from app.services import force_service, job_service
+
+    force = force_service.create_force("Alpha")
+    jobs = []
+    for _ in range(2):
+        resp = client.post("/jobs/forces.export", data={"force_id": force.id}, headers=JSON_ACCEPT)
+        jobs.append(job_service.get_job(resp.get_json()["id"]))
+        assert jobs[-1].status == "succeeded", jobs[-1].message
+        assert b'"Alpha"' in client.get(f"/jobs/{jobs[-1].id}/download").data
+
+    # Results are named by job id and intermediate files stay in per-job scratch dirs
+    job_dir = Path(app.config["JOB_DIR"])
+    assert sorted(p.name for p in job_dir.iterdir()) == sorted(f"{j.id}.result" for j in jobs)
+
+
+def test_job_status_writes_are_retried_while_the_database_is_busy(tmp_path):
+    import sqlite3
+    import threading
+
+    from app import extensions
+    from app.config import Config
+    from app.services import job_service
+
+    db_path = tmp_path / "jobs.db"
+    app = create_app(
+        {
+            "TESTING": True,
+            "DATABASE_URL": f"sqlite:///{db_path.as_posix()}",
+            "JOB_DIR": str(tmp_path / "jobs"),
+            "SQLITE_PRAGMAS": {**Config.SQLITE_PRAGMAS, "busy_timeout": 0},
+            "WRITE_RETRY_ATTEMPTS": 50,
+            "WRITE_RETRY_BASE_DELAY": 0.01,
+            "WRITE_RETRY_MAX_DELAY": 0.05,
+        }
+    )
+    blocker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+
+    @job_service.job_handler("test.lock")
+    def lock_database(ctx):
+        # Hold the write lock across the progress, result and final status writes
+        blocker.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.2, blocker.rollback).start()
+        ctx.progress(1, 1)
+        ctx.message = "done"
+
+    before = extensions.write_retry_counters()
+    try:
+        with app.app_context():
+            job_id = job_service.enqueue("test.lock").id
+            deadline = time.monotonic() + 5
+            while job_service.get_job(job_id).status in ("queued", "running"):
+                assert time.monotonic() < deadline
+                time.sleep(0.02)
+            job = job_service.get_job(job_id)
+            assert (job.status, job.message, job.progress) == ("succeeded", "done", 1)
+            assert job_id not in job_service._live_job_ids()
+    finally:
+        job_service._handlers.pop("test.lock")
+        blocker.close()
+    assert extensions.write_retry_counters()["retries"] > before["retries"]
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import io
+import json
+from datetime import UTC, datetime
+
+from app.services import chassis_index, lance_template_service, matching
+from app.services.chassis_index import ChassisIndex, IndexedMiniature
+from app.services.matching import assign_slots, hopcroft_karp
+from app.services.miniature_service import (
+    add_miniature,
+    delete_miniature,
+    import_from_stream,
+    update_miniature,
+)
+
+
+def _indexed(mid: int, chassis: str, tray: str | None = None) -> IndexedMiniature:
+    return IndexedMiniature(mid, "A", mid, "XXX", chassis, tray)
+
+
+def test_chassis_index_matches_substrings_case_insensitively():
+    index = ChassisIndex(None, 0)
+    for mid, chassis in [(5, "Atlas"), (2, "Atlas II"), (9, "Marauder"), (3, "Mad  Cat")]:
+        index.add(_indexed(mid, chassis))
+
+    assert index.match("atlas") == [2, 5]
+    assert index.match("AS I") == [2]
+    assert index.match("ma") == [3, 9]
+    assert index.match("mad cat") == [3]
+    assert index.match("zeus") == []
+    assert index.first_match("Atlas", {2}) == 5
+
+    index.add(_indexed(2, "Zeus"))  # chassis edited
+    index.remove(5)
+    assert index.match("atlas") == []
+    assert index.match("zeus") == [2]
+
+
+def test_template_matching_runs_no_sql_per_pattern(app, mini_data, query_log):
+    for uid, chassis in enumerate(["Atlas", "Atlas", "Archer", "Awesome", "Wolfhound"], 1):
+        add_miniature(mini_data | {"unique_id": uid, "chassis": chassis})
+    patterns = ["atlas", "Atlas", "Atlas", "Arch", "wolf", "Awe", "Hunchback"]
+    template = lance_template_service.create_template("Big", patterns)
+    chassis_index.get_chassis_index()  # warm
+
+    query_log.clear()
+    result = lance_template_service.match_template_miniatures(template.id, exclude_ids={3})
+    selects = [s for s in query_log if s.startswith("SELECT")]
+
+    # Version check, template and patterns, matched miniatures: independent of pattern count
+    assert len(selects) == 4
+    assert [(p, m) for p, m, _ in result["matched"]] == [
+        ("atlas", 1),
+        ("Atlas", 2),
+        ("wolf", 5),
+        ("Awe", 4),
+    ]
+    assert result["matched"][0][2].chassis == "Atlas"
+    assert result["missing"] == ["Atlas", "Arch", "Hunchback"]
+
+
+def test_chassis_index_follows_writes_incrementally(app, mini_data):
+    atlas = add_miniature(mini_data | {"chassis": "Atlas"})
+    index = chassis_index.get_chassis_index()
+
+    zeus = add_miniature(mini_data | {"unique_id": 2, "chassis": "Zeus"})
+    update_miniature(atlas.id, {"chassis": "Archer"})
+    assert chassis_index.get_chassis_index() is index
+    assert index.match("zeus") == [zeus.id]
+    assert index.match("archer") == [atlas.id] and index.match("atlas") == []
+
+    delete_miniature(zeus.id)
+    assert chassis_index.get_chassis_index() is index
+    assert index.match("zeus") == []
+
+    # Bulk imports are not applied in place; the stale index is rebuilt on next use
+    records = [mini_data | {"unique_id": 3, "chassis": "Atlas"}]
+    import_from_stream(io.BytesIO(json.dumps(records).encode()), merge=True, fmt="json")
+    rebuilt = chassis_index.get_chassis_index()
+    assert rebuilt is not index
+    assert len(rebuilt.match("atlas")) == 1
+
+
+def test_hopcroft_karp_finds_a_maximum_matching():
+    # Greedy gives slot 0 its first choice "a" and strands slot 1
+    assert hopcroft_karp([["a", "b"], ["a"]]) == ["b", "a"]
+    assert hopcroft_karp([["x"], ["x"], []]) == ["x", None, None]
+    # Longer augmenting path through three slots
+    assert hopcroft_karp([[1, 2], [1, 3], [1]]) == [2, 3, 1]
+
+
+def test_overlapping_patterns_fill_every_slot(app, mini_data):
+    shadow = add_miniature(mini_data | {"unique_id": 1, "chassis": "Shadow Hawk"})
+    night = add_miniature(mini_data | {"unique_id": 2, "chassis": "Night Hawk"})
+    template = lance_template_service.create_template("Birds", ["Hawk", "Shadow Hawk"])
+
+    result = lance_template_service.match_template_miniatures(template.id)
+    assert [(p, m) for p, m, _ in result["matched"]] == [
+        ("Hawk", night.id),
+        ("Shadow Hawk", shadow.id),
+    ]
+    assert result["missing"] == []
+
+
+def test_assignment_prefers_one_tray_then_lowest_unique_id():
+    index = ChassisIndex(None, 0)
+    index.add(IndexedMiniature(1, "A", 10, "AS7", "Atlas", "T1"))
+    index.add(IndexedMiniature(2, "A", 30, "AS7", "Atlas", "T2"))
+    index.add(IndexedMiniature(3, "A", 20, "AS7", "Atlas", "T2"))
+    index.add(IndexedMiniature(4, "A", 40, "ARC", "Archer", "T2"))
+
+    # T2 can serve both slots, so its lowest unique_id Atlas wins over the T1 one
+    assert assign_slots(index, ["Atlas", "Archer"]) == [3, 4]
+    assert assign_slots(index, ["Atlas", "Atlas", "Atlas", "Archer"]) == [3, 2, 1, 4]
+
+
+def _recording_hopcroft_karp(monkeypatch) -> list:
+    """Patch the matcher used by ``assign_slots`` to record each adjacency it is given."""
+    calls = []
+
+    def record(adjacency):
+        calls.append([len(candidates) for candidates in adjacency])
+        return hopcroft_karp(adjacency)
+
+    monkeypatch.setattr(matching, "hopcroft_karp", record)
+    return calls
+
+
+def test_assignment_scales_to_large_inventories(monkeypatch):
+    index = ChassisIndex(None, 0)
+    for mid in range(20_000):
+        index.add(_indexed(mid, f"Mech {mid % 40}", tray=f"T{mid % 300}"))
+    patterns = [f"Mech {n % 40}" for n in range(120)] + ["Mech"] * 60
+    calls = _recording_hopcroft_karp(monkeypatch)
+
+    assignment = assign_slots(index, patterns)
+    assert None not in assignment and len(set(assignment)) == len(patterns)
+    # Each slot hands the matching at most as many candidates as there are slots,
+    # however many miniatures match ("Mech" alone matches all 20,000)
+    [sizes] = calls
+    assert len(sizes) == len(patterns)
+    assert max(sizes) == matching.max_candidates(len(patterns)) == 180
+
+
+def test_force_template_feasibility_is_computed_once_per_version(client, mini_data, query_log):
+    from app.services import force_service
+
+    force = force_service.create_force("Alpha")
+    lance = force_service.create_empty_lance(force.id, "Command")
+    chassis = ["Atlas", "Atlas", "Awesome", "Shadow Hawk", "Night Hawk"]
+    minis = [
+        add_miniature(mini_data | {"unique_id": n, "chassis": c}) for n, c in enumerate(chassis)
+    ]
+    force_service.add_miniature_to_lance(minis[0].id, lance.id)
+    assault = lance_template_service.create_template("Assault", ["Atlas", "Atlas", "Awesome"])
+    birds = lance_template_service.create_template("Birds", ["Hawk", "Shadow Hawk"])
+
+    resp = client.get(f"/forces/{force.id}/feasibility")
+    assert resp.get_json()["templates"] == [
+        {
+            "template_id": assault.id,
+            "name": "Assault",
+            "slots": 3,
+            "fillable": 2,
+            "complete": False,
+            "missing": ["Atlas"],
+        },
+        {
+            "template_id": birds.id,
+            "name": "Birds",
+            "slots": 2,
+            "fillable": 2,
+            "complete": True,
+            "missing": [],
+        },
+    ]
+    assert (
+        client.get(resp.request.path, headers={"If-None-Match": resp.headers["ETag"]}).status_code
+        == 304
+    )
+
+    # Cached until a version changes: only the version check runs
+    query_log.clear()
+    assert lance_template_service.force_template_feasibility(force.id)[0].fillable == 2
+    assert [s for s in query_log if s.startswith("SELECT")] == [query_log[-1]]
+    assert "data_versions" in query_log[-1]
+
+    force_service.remove_miniature_from_force(minis[0].id, force.id)
+    assert lance_template_service.force_template_feasibility(force.id)[0].complete
+
+    page = client.get(f"/forces/{force.id}").get_data(as_text=True)
+    assert 'id="templateFeasibility"' in page and "3/3" in page
+    assert client.get("/forces/999/feasibility").status_code == 404
+
+
+def test_chassis_patterns_support_exact_prefix_glob_regex_and_alternation():
+    index = ChassisIndex(None, 0)
+    index.add(IndexedMiniature(1, "A", 1, "AS7", "Atlas", None))
+    index.add(IndexedMiniature(2, "A", 2, "AS7", "Atlas II", None))
+    index.add(IndexedMiniature(3, "A", 3, "SHD", "Shadow Hawk", None))
+    index.add(IndexedMiniature(4, "A", 4, "BLH", "Blackhawk", None))
+    index.add(IndexedMiniature(5, "A", 5, "NTH", "Nighthawk II", None))
+    index.add(IndexedMiniature(6, "A", 6, "ARC", "Archer", None))
+    index.add(IndexedMiniature(7, "A", 7, "CPLT", "Catapult", None))
+
+    assert index.match("atlas") == [1, 2]
+    assert index.match("=ATLAS") == [1]
+    assert index.match("prefix:as7") == [1, 2]
+    assert index.match("Shadow*") == [3]
+    assert index.match("*hawk") == [3, 4]
+    assert index.match("Atlas ?I") == [2]
+    assert index.match("/(Black|Night)hawk( II)?/") == [4, 5]
+    assert index.match("Archer|Catapult") == [6, 7]
+    assert index.match("=Archer | prefix:SHD | /black.*/") == [3, 4, 6]
+    assert index.match("/[unclosed/") == []
+
+
+def test_patterns_are_compiled_once():
+    from app.services.patterns import compile_pattern
+
+    compile_pattern.cache_clear()
+    index = ChassisIndex(None, 0)
+    index.add(_indexed(1, "Archer"))
+    for _ in range(3):
+        index.match("Archer|Catapult")
+    info = compile_pattern.cache_info()
+    # The alternation and each alternative compile once; the rest are hits
+    assert (info.misses, info.hits) == (3, 2)
+
+
+def test_invalid_patterns_are_rejected_by_the_template_form(client):
+    resp = client.post(
+        "/lance-templates/create",
+        data={"name": "Broken", "chassis_0": "Atlas", "chassis_1": "/(unclosed/"},
+        follow_redirects=True,
+    )
+    assert b"Invalid chassis pattern" in resp.data
+    assert lance_template_service.get_all_templates() == []
+
+
+def test_joint_matching_at_battalion_scale_is_one_bounded_matching(
+    app, mini_data, query_log, monkeypatch
+):
+    from sqlalchemy import insert
+
+    from app import extensions
+    from app.models.miniature import Miniature
+
+    created_at = datetime.now(UTC).replace(tzinfo=None)
+    rows = [
+        mini_data
+        | {"unique_id": n, "chassis": f"Mech {n % 60}", "tray_id": f"T{n % 200}"}
+        | {"created_at": created_at}
+        for n in range(10_000)
+    ]
+    with extensions.session_scope() as session:
+        session.execute(insert(Miniature), rows)
+    templates = [
+        lance_template_service.create_template(
+            f"L{n}", [f"Mech {(n * 4 + k) % 60}" for k in range(4)]
+        )
+        for n in range(27)
+    ]
+    chassis_index.get_chassis_index()  # warm
+    calls = _recording_hopcroft_karp(monkeypatch)
+
+    query_log.clear()
+    result = lance_template_service.match_templates_jointly([t.id for t in templates])
+    selects = [s for s in query_log if s.startswith("SELECT")]
+
+    assert all(not lance["missing"] for lance in result["lances"])
+    assigned = [mid for lance in result["lances"] for _, mid, _ in lance["matched"]]
+    assert len(assigned) == len(set(assigned)) == 108
+    # One matching over all 108 slots, each with a capped candidate list, and a fixed
+    # number of queries (templates, patterns, version check, matched miniatures)
+    [sizes] = calls
+    assert len(sizes) == 108 and max(sizes) <= matching.max_candidates(108)
+    assert len(selects) == 4
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+from sqlalchemy import create_engine, inspect, text
+
+import app.models  # noqa: F401
+from app.extensions import Base
+from app.migrations import MIGRATIONS, upgrade
+
+
+def test_upgrade_existing_database(tmp_path):
+    """An unversioned database gains the search index and join indexes, once."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Simulate a database created before indexes were declared
+        for name in ("ix_miniatures_chassis", "ix_lances_force_id"):
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        conn.exec_driver_sql(
+            "INSERT INTO miniatures (series, unique_id, prefix, chassis, type, created_at)"
+            " VALUES ('A', 1, 'WHM', 'Warhammer', 'Mech', '2025-01-01 00:00:00')"
+        )
+
+    assert upgrade(engine) == sorted(m.version for m in MIGRATIONS)
+    assert upgrade(engine) == []
+
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("lances")}
+    assert "ix_lances_force_id" in indexes
+    with engine.connect() as conn:
+        hits = conn.execute(
+            text("SELECT rowid FROM miniatures_fts WHERE miniatures_fts MATCH 'hammer'")
+        ).all()
+        assert len(hits) == 1
+    engine.dispose()
+
+
+def test_upgrade_keeps_one_active_force(tmp_path):
+    """Databases with several active forces keep the latest one before the index is built."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ux_forces_single_active")
+        for name, updated in (("Old", "2025-01-01"), ("New", "2025-06-01"), ("Mid", "2025-03-01")):
+            conn.execute(
+                text(
+                    "INSERT INTO forces (name, is_active, created_at, updated_at)"
+                    " VALUES (:name, 1, :updated, :updated)"
+                ),
+                {"name": name, "updated": updated},
+            )
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        active = conn.execute(text("SELECT name FROM forces WHERE is_active = 1")).scalars()
+        assert list(active) == ["New"]
+    assert "ux_forces_single_active" in {ix["name"] for ix in inspect(engine).get_indexes("forces")}
+    engine.dispose()
+
+
+def test_upgrade_backfills_force_miniature_force_id(tmp_path):
+    """Assignments gain their lance's force id; duplicates within a force are dropped."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # The force_miniatures table as it was before force_id was denormalized
+        conn.exec_driver_sql("DROP TABLE force_miniatures")
+        conn.exec_driver_sql(
+            "CREATE TABLE force_miniatures (id INTEGER PRIMARY KEY,"
+            " lance_id INTEGER NOT NULL REFERENCES lances (id),"
+            " miniature_id INTEGER NOT NULL REFERENCES miniatures (id),"
+            ' "order" INTEGER NOT NULL, UNIQUE (lance_id, miniature_id))'
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO forces (id, name, is_active, created_at, updated_at) VALUES"
+            " (1, 'Alpha', 1, '2025-01-01', '2025-01-01'),"
+            " (2, 'Bravo', 0, '2025-01-01', '2025-01-01')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO lances (id, force_id, "order") VALUES (10, 1, 1), (11, 1, 2), (20, 2, 1)'
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO miniatures (id, series, unique_id, prefix, chassis, type, created_at)"
+            " VALUES (7, 'A', 1, 'WHM', 'Warhammer', 'Mech', '2025-01-01')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO force_miniatures (id, lance_id, miniature_id, "order")'
+            " VALUES (1, 10, 7, 1), (2, 11, 7, 1), (3, 20, 7, 1), (4, 99, 7, 1)"
+        )
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("SELECT id, force_id FROM force_miniatures ORDER BY id").all()
+        assert [tuple(r) for r in rows] == [(1, 1), (3, 2)]
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("force_miniatures")}
+    assert "uix_force_miniature" in indexes
+    engine.dispose()
+
+
+def test_upgrade_drops_rows_pointing_at_deleted_parents(tmp_path):
+    """Rows left behind before foreign keys were enforced are deleted."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO forces (id, name, is_active, created_at, updated_at)"
+            " VALUES (1, 'Alpha', 1, '2025-01-01', '2025-01-01')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO lances (id, force_id, "order") VALUES (10, 1, 1), (20, 2, 1)'
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO miniatures (id, series, unique_id, prefix, chassis, type, created_at)"
+            " VALUES (7, 'A', 1, 'WHM', 'Warhammer', 'Mech', '2025-01-01'),"
+            " (8, 'A', 2, 'ARC', 'Archer', 'Mech', '2025-01-01')"
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO force_miniatures (id, force_id, lance_id, miniature_id, "order") VALUES'
+            " (1, 1, 10, 7, 1), (2, 1, 10, 99, 2), (3, 1, 20, 8, 1), (4, 2, 20, 7, 2)"
+        )
+        conn.exec_driver_sql("INSERT INTO lance_templates (id, name) VALUES (1, 'Assault')")
+        conn.exec_driver_sql(
+            'INSERT INTO lance_template_miniatures (id, template_id, chassis_pattern, "order")'
+            " VALUES (1, 1, 'Atlas', 0), (2, 5, 'Atlas', 0)"
+        )
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("SELECT id FROM lances").scalars().all() == [10]
+        assert conn.exec_driver_sql("SELECT id FROM force_miniatures").scalars().all() == [1]
+        templates = conn.exec_driver_sql("SELECT id FROM lance_template_miniatures").scalars()
+        assert templates.all() == [1]
+        assert conn.exec_driver_sql("PRAGMA foreign_key_check").all() == []
+    engine.dispose()
+
+
+def test_concurrent_upgrades_apply_each_step_once(tmp_path):
+    """Workers starting together serialize on the write lock instead of racing."""
+    import threading
+
+    from app.extensions import _use_explicit_sqlite_transactions
+
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    engines = [create_engine(url, connect_args={"timeout": 30}) for _ in range(4)]
+    for engine in engines:
+        _use_explicit_sqlite_transactions(engine)
+    Base.metadata.create_all(bind=engines[0])
+
+    results: list[list[int]] = []
+    errors: list[BaseException] = []
+    start = threading.Barrier(len(engines))
+
+    def run(engine) -> None:
+        start.wait()
+        try:
+            results.append(upgrade(engine))
+        except BaseException as exc:  # noqa: BLE001
+            errors.append(exc)
+
+    threads = [threading.Thread(target=run, args=(engine,)) for engine in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(v for applied in results for v in applied) == sorted(
+        m.version for m in MIGRATIONS
+    )
+    with engines[0].connect() as conn:
+        versions = conn.exec_driver_sql("SELECT version FROM schema_version").scalars().all()
+        assert sorted(versions) == sorted(m.version for m in MIGRATIONS)
+        conn.exec_driver_sql("SELECT rowid FROM miniatures_fts LIMIT 1").all()
+    for engine in engines:
+        engine.dispose()
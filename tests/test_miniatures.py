@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import base64
 import io
 import json
 
@@ -153,3 +154,384 @@ def test_duplicate_prefill(client):
     assert 'value="3"' in html or ">3<" in html
     # Prefilled chassis
     assert "Banshee" in html
+
+
+def test_list_keyset_pagination(client):
+    """Paging with a small page_size should walk every row exactly once, in sort order."""
+    import re
+
+    for uid in range(1, 6):
+        client.post(
+            "/miniatures/add",
+            data={
+                "series": "A",
+                "unique_id": uid,
+                "prefix": "LCT",
+                "chassis": f"Locust {uid}",
+                "type": "Mech",
+            },
+        )
+
+    seen = []
+    url = "/miniatures?sort=unique_id&direction=desc&page_size=2"
+    while url:
+        html = client.get(url).get_data(as_text=True)
+        seen.extend(int(n) for n in re.findall(r"Locust (\d)", html))
+        match = re.search(r'href="([^"]*after=[^"]+)"', html)
+        url = match.group(1).replace("&amp;", "&") if match else None
+
+    assert seen == [5, 4, 3, 2, 1]
+
+
+def test_miniatures_page_cursor(app, mini_data):
+    from app.services.miniature_service import add_miniature, get_miniatures_page
+
+    for uid, tray in ((1, None), (2, "T2"), (3, None)):
+        add_miniature(mini_data | {"unique_id": uid, "tray_id": tray})
+
+    first = get_miniatures_page(sort="tray_id", direction="asc", page_size=2)
+    assert [m.unique_id for m in first] == [1, 3]
+    assert first.next_cursor is not None
+
+    second = get_miniatures_page(
+        sort="tray_id", direction="asc", page_size=2, after=first.next_cursor
+    )
+    assert [m.unique_id for m in second] == [2]
+    assert second.next_cursor is None
+
+    # Crafted cursors whose values cannot be bound fall back to the first page
+    for values in ([{"a": 1}, 2, 3], [[1], None, 2], [None, 2**64, 3]):
+        crafted = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+        page = get_miniatures_page(sort="tray_id", direction="asc", page_size=2, after=crafted)
+        assert [m.unique_id for m in page] == [1, 3]
+
+
+def test_search_uses_full_text_index(app, mini_data):
+    from app.services.miniature_service import add_miniature, get_all_miniatures, update_miniature
+
+    add_miniature(mini_data | {"unique_id": 1000, "chassis": "Shadow Hawk", "prefix": "SHD"})
+    add_miniature(mini_data | {"unique_id": 1050, "chassis": "Phoenix Hawk", "prefix": "PXH"})
+    hawk = add_miniature(mini_data | {"unique_id": 1200, "chassis": "Hawk Moth", "type": "VTOL"})
+
+    def uids(q):
+        return sorted(m.unique_id for m in get_all_miniatures(q))
+
+    # Case-insensitive substring matching, tokens ANDed together
+    assert uids("HAWK") == [1000, 1050, 1200]
+    assert uids("hawk shad") == [1000]
+    assert uids('"x hawk"') == [1050]
+    # unique_id ranges combine with text tokens
+    assert uids("1000-1100") == [1000, 1050]
+    assert uids("hawk 1100-1000") == [1000, 1050]
+    # Exact unique_id still matches
+    assert uids("1200") == [1200]
+
+    # Triggers keep the index in sync with edits
+    update_miniature(hawk.id, {"chassis": "Sparrowhawk"})
+    assert uids("moth") == []
+    assert uids("sparrow") == [1200]
+
+
+def test_search_ranks_and_pages(app, mini_data):
+    from app.services.miniature_service import add_miniature, get_miniatures_page
+
+    for uid, chassis in enumerate(["Hawk Moth", "Shadow Hawk", "Phoenix Hawk", "Archer"], 1):
+        add_miniature(mini_data | {"unique_id": uid, "chassis": chassis})
+
+    first = get_miniatures_page("hawk", page_size=2)
+    rows = [m.chassis for m in first]
+    second = [m.chassis for m in get_miniatures_page("hawk", after=first.next_cursor)]
+    assert len(rows) == 2
+    assert sorted(rows + second) == ["Hawk Moth", "Phoenix Hawk", "Shadow Hawk"]
+
+
+def test_export_streams_pretty_compact_and_gzip(client, mini_data):
+    import gzip
+
+    from app.services.miniature_service import iter_export_json, iter_export_rows
+
+    assert "".join(iter_export_json()) == "[]"
+    for uid in (3, 1, 2):
+        client.post("/miniatures/add", data=mini_data | {"unique_id": uid})
+
+    rows = list(iter_export_rows())
+    assert "".join(iter_export_json()) == json.dumps(rows, indent=2)
+    assert "".join(iter_export_json(compact=True)) == json.dumps(rows, separators=(",", ":"))
+
+    resp = client.get("/miniatures/export?compact=1&gzip=1")
+    assert resp.mimetype == "application/gzip"
+    assert "miniatures.json.gz" in resp.headers["Content-Disposition"]
+    exported = json.loads(gzip.decompress(resp.data))
+    assert [m["unique_id"] for m in exported] == [1, 2, 3]
+
+
+def test_import_upserts_and_reports_bad_records(client, mini_data):
+    from app.services.miniature_service import get_all_miniatures, import_miniatures
+
+    client.post("/miniatures/add", data=mini_data | {"unique_id": 1, "tray_id": "T9"})
+    original_id = get_all_miniatures()[0].id
+
+    report = import_miniatures(
+        [
+            {"unique_id": "1", "prefix": "WHM", "chassis": "Warhammer IIC", "type": "Mech"},
+            {"unique_id": "x1", "prefix": "BNC", "chassis": "Banshee", "type": "Mech"},
+            {"series": "B", "unique_id": 1, "prefix": "VDT", "chassis": "Vedette", "type": "Tank"},
+            {"unique_id": 3, "prefix": "LCT", "type": "Mech"},
+            "not a record",
+            {"unique_id": True, "prefix": "LCT", "chassis": "Locust", "type": "Mech"},
+            {"unique_id": 3.9, "prefix": "LCT", "chassis": "Locust", "type": "Mech"},
+            {"unique_id": 4, "prefix": "LCT", "chassis": ["Locust"], "type": "Mech"},
+            {"unique_id": 5, "prefix": "LCT", "chassis": "Locust", "type": "Mech", "tray_id": {}},
+            {"unique_id": 6.0, "prefix": "LCT", "chassis": "Locust", "type": "Mech"},
+            {"unique_id": 10**20, "prefix": "LCT", "chassis": "Locust", "type": "Mech"},
+            {"unique_id": -1e30, "prefix": "LCT", "chassis": "Locust", "type": "Mech"},
+        ],
+        merge=True,
+    )
+
+    assert report["imported"] == 3
+    assert report["error_count"] == 9
+    assert [e["record"] for e in report["errors"]] == [2, 4, 5, 6, 7, 8, 9, 11, 12]
+    assert report["errors"][5]["error"] == "chassis ['Locust'] is not a string"
+    assert report["errors"][7]["error"] == f"unique_id {10**20!r} is out of range"
+    minis = {(m.series, m.unique_id): m for m in get_all_miniatures()}
+    assert minis[("A", 1)].id == original_id
+    assert minis[("A", 1)].chassis == "Warhammer IIC"
+    # Fields missing from the record keep their stored value
+    assert minis[("A", 1)].tray_id == "T9"
+    assert ("B", 1) in minis
+    assert minis[("A", 6)].chassis == "Locust"
+
+
+def test_overwrite_import_keeps_ids_and_drops_unlisted(client, mini_data):
+    from app.services.miniature_service import get_all_miniatures, import_miniatures
+
+    for uid in (1, 2):
+        client.post("/miniatures/add", data=mini_data | {"unique_id": uid})
+    kept = next(m for m in get_all_miniatures() if m.unique_id == 1)
+
+    report = import_miniatures([mini_data | {"unique_id": 1}, mini_data | {"unique_id": 5}])
+
+    assert report == {"imported": 2, "error_count": 0, "errors": []}
+    minis = get_all_miniatures()
+    assert sorted(m.unique_id for m in minis) == [1, 5]
+    assert next(m for m in minis if m.unique_id == 1).id == kept.id
+
+
+def test_ndjson_and_csv_round_trip(client, mini_data):
+    from app.services.miniature_service import get_all_miniatures
+
+    for uid in (1, 2):
+        client.post("/miniatures/add", data=mini_data | {"unique_id": uid, "status": ""})
+
+    for fmt in ("ndjson", "csv"):
+        exported = client.get(f"/miniatures/export?format={fmt}").data
+        assert exported.count(b"\n") == (2 if fmt == "ndjson" else 3)
+        # Upload under a neutral name so the format is detected from the contents
+        resp = client.post(
+            "/miniatures/import",
+            data={"file": (io.BytesIO(exported), "upload.txt")},
+            content_type="multipart/form-data",
+            follow_redirects=True,
+        )
+        assert "Imported 2 miniatures" in resp.get_data(as_text=True)
+        assert sorted(m.unique_id for m in get_all_miniatures()) == [1, 2]
+
+
+def test_import_legacy_csv_and_bad_ndjson_lines(app, tmp_path):
+    from app.services.miniature_service import get_all_miniatures, import_from_file
+
+    legacy = tmp_path / "original.csv"
+    legacy.write_text(
+        "Unit,Series,ID Number,Formation,Prefix,Weight,Size,,,,,\n"
+        "Archer,A,06,,ARC,70,3,,Battle Lance,Command Lance,Fire Lance,Urban Lance\n"
+        "Assassin,,33,,ASN,,,,,,,\n"
+        ",,,,,,,,,,,\n"
+        "Atlas,,,,AS7,,,,,,,\n",
+        encoding="utf-8",
+    )
+    report = import_from_file(str(legacy))
+    assert report["imported"] == 2
+    assert report["errors"] == [{"record": 3, "error": "unique_id None is not an integer"}]
+    archer = next(m for m in get_all_miniatures() if m.chassis == "Archer")
+    assert (archer.series, archer.unique_id, archer.prefix, archer.type) == ("A", 6, "ARC", "Mech")
+
+    lines = tmp_path / "minis.ndjson"
+    lines.write_text(
+        '{"unique_id": 7, "prefix": "WHM", "chassis": "Warhammer", "type": "Mech"}\n{not json\n',
+        encoding="utf-8",
+    )
+    report = import_from_file(str(lines), merge=True)
+    assert report["imported"] == 1
+    assert report["errors"][0]["record"] == 2
+    assert "line 2" in report["errors"][0]["error"]
+
+
+def test_import_reads_spooled_upload_and_enforces_size_limit(app, client, mini_data):
+    # Spool the upload to its own temp file; nothing is written to the working directory
+    app.config["UPLOAD_SPOOL_THRESHOLD"] = 16
+    payload = json.dumps([mini_data]).encode("utf-8")
+    resp = client.post(
+        "/miniatures/import",
+        data={"file": (io.BytesIO(payload), "minis.json"), "merge": "on"},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert "Imported 1 miniatures" in resp.get_data(as_text=True)
+
+    app.config["MAX_CONTENT_LENGTH"] = 256
+    resp = client.post(
+        "/miniatures/import",
+        data={"file": (io.BytesIO(payload * 10), "minis.json")},
+        headers={"Accept": "text/html,application/xhtml+xml,*/*;q=0.8"},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert "Upload too large" in resp.get_data(as_text=True)
+
+    # Script callers (fetch sends */*) get a usable 413 instead of a redirect
+    for path in ("/jobs/miniatures.import", "/forces/1/lances/from-template"):
+        resp = client.post(
+            path,
+            data={"file": (io.BytesIO(payload * 10), "minis.json")},
+            headers={"Accept": "*/*"},
+            content_type="multipart/form-data",
+        )
+        assert resp.status_code == 413
+        assert resp.get_json()["error"].startswith("Upload too large")
+
+
+def test_list_and_export_answer_conditional_get(client, mini_data, query_log):
+    # The page and the export are streamed: each response is read to the end (or closed)
+    # so its generator, and the request context it holds, finish inside the test
+    def get(url, **kwargs):
+        with client.get(url, **kwargs) as resp:
+            resp.get_data()
+        return resp
+
+    # The add redirects with a pending flash message, so that page is not tagged
+    first = client.post("/miniatures/add", data=mini_data, follow_redirects=True)
+    assert first.headers.get("ETag") is None
+
+    page = get("/miniatures")
+    assert "Miniature added" not in page.get_data(as_text=True)
+    etag = page.headers["ETag"]
+    query_log.clear()
+    cached = get("/miniatures", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    # Only the version lookup runs; no miniature or force rows are loaded
+    selects = [sql for sql in query_log if sql.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 1 and "data_versions" in selects[0]
+
+    other_query = get("/miniatures?q=War", headers={"If-None-Match": etag})
+    assert other_query.status_code == 200
+
+    export = get("/miniatures/export")
+    assert (
+        get("/miniatures/export", headers={"If-None-Match": export.headers["ETag"]}).status_code
+        == 304
+    )
+
+    client.post("/miniatures/add", data=mini_data | {"unique_id": 1002})
+    get("/miniatures")  # consume the flash message
+    changed = get("/miniatures", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+    # Force changes also invalidate the inventory page, which shows assignments
+    etag = changed.headers["ETag"]
+    client.post("/forces/create", data={"name": "Alpha"})
+    get("/forces")
+    assert get("/miniatures", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_etags_agree_across_workers_and_follow_the_deploy_salt(tmp_path):
+    from app import create_app
+
+    def worker(**config):
+        return create_app(
+            {"TESTING": True, "DATABASE_URL": "sqlite+pysqlite:///:memory:"}
+            | {"JOB_DIR": str(tmp_path / "jobs")}
+            | config
+        ).test_client()
+
+    # Two processes of one deploy (same data versions) tag the page identically
+    etag = worker().get("/miniatures").headers["ETag"]
+    assert worker().get("/miniatures", headers={"If-None-Match": etag}).status_code == 304
+    assert worker(ETAG_SALT="next-release").get("/miniatures").headers["ETag"] != etag
+
+
+def test_list_rows_come_from_fragment_cache(app, client, mini_data, query_log):
+    from app.services.miniature_service import get_all_miniatures
+
+    for uid in range(1, 6):
+        client.post("/miniatures/add", data=mini_data | {"unique_id": uid})
+    client.get("/miniatures")  # consume the flash message
+    cache = app.extensions["fragment_cache"]
+    cache.clear()
+
+    first = client.get("/miniatures").get_data(as_text=True)
+    assert cache.size > 0
+
+    # An unchanged inventory is served from the cached page without loading any rows
+    query_log.clear()
+    hits = cache.hits
+    assert client.get("/miniatures").get_data(as_text=True) == first
+    assert cache.hits == hits + 1
+    assert not any("FROM miniatures" in sql for sql in query_log)
+
+    # Editing one miniature re-renders only that row
+    target = get_all_miniatures()[2]
+    client.post(
+        f"/miniatures/{target.id}/edit", data=mini_data | {"unique_id": 3, "chassis": "Atlas"}
+    )
+    client.get("/miniatures")
+    misses = cache.misses
+    body = client.get("/miniatures?q=").get_data(as_text=True)
+    assert "Atlas" in body
+    # One miss for the page entry and one for the edited row
+    assert cache.misses == misses + 2
+
+
+def test_fragment_cache_evicts_to_byte_budget():
+    from app.blueprints.caching import FragmentCache
+
+    cache = FragmentCache(max_bytes=10)
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # refreshes "a"
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert cache.size == 8
+    cache.put("huge", "x" * 11)
+    assert cache.get("huge") is None
+
+
+def test_list_html_grows_with_rows_not_rows_times_lances(app, client, mini_data):
+    from app.services import force_service
+
+    # More miniatures than the largest page, so every page carries the same "Next" link
+    for uid in range(100, 140):
+        client.post("/miniatures/add", data=mini_data | {"unique_id": uid})
+    client.get("/miniatures")  # consume the flash message
+    force = force_service.create_force("Alpha")
+    force_service.create_empty_lance(force.id, "Lance 1")
+
+    def page_bytes(rows: int) -> int:
+        return len(client.get(f"/miniatures?page_size={rows}").get_data())
+
+    def row_cost() -> tuple[int, int]:
+        small, medium, large = page_bytes(10), page_bytes(20), page_bytes(30)
+        return medium - small, large - medium
+
+    one_lance = row_cost()
+    for n in range(2, 41):
+        force_service.create_empty_lance(force.id, f"Lance {n}")
+    forty_lances = row_cost()
+
+    # Each extra row costs the same, and that cost does not depend on the number of lances
+    assert abs(one_lance[0] - one_lance[1]) <= 0.05 * one_lance[0]
+    assert abs(forty_lances[0] - one_lance[0]) <= 0.05 * one_lance[0]
+    assert abs(forty_lances[1] - one_lance[1]) <= 0.05 * one_lance[1]
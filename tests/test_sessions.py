@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import io
+import json
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, extensions
+from app.config import Config
+from app.services import force_service
+from app.services.miniature_service import add_miniature
+
+
+@pytest.fixture()
+def file_app(tmp_path):
+    return create_app(
+        {
+            "TESTING": True,
+            "DATABASE_URL": f"sqlite:///{(tmp_path / 'uow.db').as_posix()}",
+            "JOB_DIR": str(tmp_path / "jobs"),
+        }
+    )
+
+
+def test_get_request_uses_one_read_only_transaction(file_app, mini_data):
+    add_miniature(mini_data)
+    force = force_service.create_force("Alpha")
+    force_service.create_empty_lance(force.id, "Lance 1")
+
+    statements: list[str] = []
+    checkouts: list[object] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):  # noqa: ARG001
+        statements.append(statement.split()[0].upper())
+
+    event.listen(extensions.engine, "before_cursor_execute", record)
+    event.listen(extensions.engine, "checkout", lambda *args: checkouts.append(args))
+    body = file_app.test_client().get("/miniatures").get_data(as_text=True)
+
+    assert "Warhammer" in body and "Alpha" in body
+    # Versions, active force and rows all share one connection and one deferred transaction
+    assert len(checkouts) == 1
+    assert statements.count("BEGIN") == 1
+    assert "COMMIT" not in statements
+    assert statements.count("SELECT") >= 3
+
+
+def test_writes_through_read_only_unit_of_work_are_rejected(file_app, mini_data):
+    with file_app.test_request_context("/miniatures"):
+        with pytest.raises(extensions.ReadOnlySessionError):
+            add_miniature(mini_data)
+
+    # Outside a read-only request, writes commit as before
+    assert add_miniature(mini_data).id
+
+
+def test_write_scopes_in_a_read_only_request_raise(file_app):
+    from sqlalchemy import insert
+
+    from app.models.force import Force
+
+    with file_app.test_request_context("/miniatures", method="GET"):
+        with pytest.raises(extensions.ReadOnlySessionError):
+            with extensions.session_scope() as session:
+                session.execute(insert(Force).values(name="Core insert", is_active=False))
+    assert force_service.get_all_forces() == []
+
+
+def test_nested_scopes_join_the_outer_transaction(file_app):
+    from app.models.force import Force
+    from app.services.version_service import get_versions
+
+    with extensions.session_scope() as session:
+        session.add(Force(name="First", is_active=False))
+        session.flush()
+        # A nested read neither marks the outer session read-only nor closes it
+        get_versions("forces")
+        session.add(Force(name="Second", is_active=False))
+
+    assert sorted(f.name for f in force_service.get_all_forces()) == ["First", "Second"]
+
+    with pytest.raises(extensions.ReadOnlySessionError):
+        with extensions.session_scope(read_only=True):
+            with extensions.session_scope():
+                pass
+
+
+def test_sqlite_connections_use_the_configured_profile(file_app):
+    with extensions.engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()  # noqa: E731
+        assert pragma("journal_mode") == "wal"
+        assert pragma("synchronous") == 1  # NORMAL
+        assert pragma("foreign_keys") == 1
+        assert pragma("busy_timeout") == file_app.config["SQLITE_PRAGMAS"]["busy_timeout"]
+    assert extensions.engine.pool.size() == file_app.config["DB_POOL_SIZE"]
+
+
+def test_deleting_an_assigned_miniature_drops_its_assignment(file_app, mini_data):
+    from app.services.miniature_service import delete_miniature
+
+    mini = add_miniature(mini_data)
+    force = force_service.create_force("Alpha")
+    lance = force_service.create_empty_lance(force.id, "Lance 1")
+    force_service.add_miniature_to_lance(mini.id, lance.id)
+    force_service.switch_force(force.id)
+    assert force_service.get_active_force_snapshot().assigned_miniature_ids == {mini.id}
+
+    assert delete_miniature(mini.id)
+    assert force_service.get_active_force().lances[0].miniatures == ()
+    assert force_service.get_active_force_snapshot().assigned_miniature_ids == set()
+
+
+def test_snapshot_built_from_a_stale_request_is_not_kept(file_app, mini_data):
+    from app.services.version_service import get_versions
+
+    mini = add_miniature(mini_data)
+    force = force_service.create_force("Alpha")
+    lance = force_service.create_empty_lance(force.id, "Lance 1")
+    force_service.switch_force(force.id)
+
+    with file_app.test_request_context("/miniatures"):
+        get_versions("miniatures")  # opens the request's read transaction
+        # Another thread commits (and drops the cache) after the request's snapshot began
+        writer = threading.Thread(
+            target=force_service.add_miniature_to_lance, args=(mini.id, lance.id)
+        )
+        writer.start()
+        writer.join(timeout=2)
+        assert not writer.is_alive()
+
+        # The request rebuilds the snapshot from what it can see: the force before the write
+        assert force_service.get_active_force_snapshot().assigned_miniature_ids == set()
+
+    assert force_service.get_active_force_snapshot().assigned_miniature_ids == {mini.id}
+
+
+def test_writes_begin_immediate(file_app, mini_data):
+    statements: list[str] = []
+    event.listen(
+        extensions.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    event.listen(extensions.engine, "commit", lambda conn: statements.append("COMMIT"))
+    add_miniature(mini_data)
+
+    assert statements[0] == "BEGIN IMMEDIATE"
+    assert statements[-1] == "COMMIT"
+
+
+def test_imports_release_the_write_lock_between_batches(file_app, mini_data, monkeypatch):
+    from app.services import miniature_service
+
+    monkeypatch.setattr(miniature_service, "IMPORT_BATCH_SIZE", 2)
+    records = [mini_data | {"unique_id": uid} for uid in range(1, 6)]
+    statements: list[str] = []
+    event.listen(
+        extensions.engine,
+        "before_cursor_execute",
+        lambda conn, cursor, statement, *args: statements.append(statement),
+    )
+    event.listen(extensions.engine, "commit", lambda conn: statements.append("COMMIT"))
+
+    # Reading and staging the file holds no lock: another writer goes straight through
+    concurrent: list[threading.Thread] = []
+
+    def write_meanwhile(done: int) -> None:  # noqa: ARG001
+        writer = threading.Thread(
+            target=add_miniature, args=(mini_data | {"unique_id": 100 + len(concurrent)},)
+        )
+        concurrent.append(writer)
+        writer.start()
+        writer.join(timeout=2)
+        assert not writer.is_alive()
+
+    report = miniature_service.import_miniatures(records, merge=True, progress=write_meanwhile)
+    assert report["imported"] == 5 and len(concurrent) == 2
+
+    # Applying commits every batch instead of holding one transaction for the file
+    events = [
+        "UPSERT" if "ON CONFLICT" in s else s
+        for s in statements
+        if s in ("BEGIN IMMEDIATE", "COMMIT") or "ON CONFLICT" in s
+    ]
+    first = events.index("UPSERT") - 1
+    assert events[first : first + 9] == ["BEGIN IMMEDIATE", "UPSERT", "COMMIT"] * 3
+
+    # A file that fails to parse part-way never reaches the inventory
+    broken = json.dumps([mini_data | {"unique_id": uid} for uid in range(10, 15)])[:-20]
+    with pytest.raises(ValueError):
+        miniature_service.import_from_stream(io.BytesIO(broken.encode()), fmt="json")
+    assert len(miniature_service.get_all_miniatures()) == 7
+
+
+def test_busy_writes_are_retried_until_the_lock_is_released(tmp_path, mini_data):
+    db_path = tmp_path / "busy.db"
+    app = create_app(
+        {
+            "TESTING": True,
+            "DATABASE_URL": f"sqlite:///{db_path.as_posix()}",
+            "JOB_DIR": str(tmp_path / "jobs"),
+            # Fail fast inside SQLite so the service-level retry does the waiting
+            "SQLITE_PRAGMAS": {**Config.SQLITE_PRAGMAS, "busy_timeout": 0},
+            "WRITE_RETRY_ATTEMPTS": 50,
+            "WRITE_RETRY_BASE_DELAY": 0.01,
+            "WRITE_RETRY_MAX_DELAY": 0.05,
+        }
+    )
+    before = extensions.write_retry_counters()
+
+    blocker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.2, blocker.rollback).start()
+    with app.app_context():
+        mini = add_miniature(mini_data)
+    blocker.close()
+
+    after = extensions.write_retry_counters()
+    assert mini.id
+    assert after["retries"] > before["retries"]
+    assert after["give_ups"] == before["give_ups"]
+
+
+def test_retry_gives_up_and_the_request_gets_a_503(app, client):
+    busy = OperationalError("BEGIN IMMEDIATE", {}, sqlite3.OperationalError("database is locked"))
+    calls = []
+
+    @extensions.retry_on_busy
+    def always_busy():
+        calls.append(1)
+        raise busy
+
+    extensions.retry_policy = extensions.RetryPolicy(attempts=3, base_delay=0, max_delay=0)
+    before = extensions.write_retry_counters()
+    with pytest.raises(OperationalError):
+        always_busy()
+    after = extensions.write_retry_counters()
+
+    assert len(calls) == 3
+    assert after["retries"] - before["retries"] == 2
+    assert after["give_ups"] - before["give_ups"] == 1
+
+    app.add_url_rule("/busy", "busy", always_busy, methods=["POST"])
+    resp = client.post("/busy")
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "1"